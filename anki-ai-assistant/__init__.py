@@ -1,13 +1,41 @@
 """
 AI Card Assistant - Anki Add-on
 Helps you refine, clarify, and expand flashcards using AI during review.
+
+Only menu actions and hooks are set up at startup. The dialogs, API client
+and caches are imported the first time they are needed, so the add-on adds
+next to nothing to Anki's startup time (see benchmark-addon-startup.py in
+the repository root).
 """
 
+import os
+
 from aqt import mw, gui_hooks
 from aqt.qt import QAction, QKeySequence
 from aqt.utils import showInfo, tooltip
-from .ai_assistant import AIAssistantDialog
-from .settings import open_settings
+
+# Same path as message_batches.JOBS_FILE, without importing it
+PENDING_BATCHES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    "user_files", "message_batches.json")
+
+_config = None   # see get_config()
+
+
+def get_config():
+    """
+    The add-on's config, read once and cached; the reviewer hook runs for
+    every card, so it shouldn't go to disk each time.
+    """
+    global _config
+    if _config is None:
+        _config = mw.addonManager.getConfig(__name__) or {}
+    return _config
+
+
+def on_config_updated(config):
+    """Replace the cached config (config editor or the settings dialog)."""
+    global _config
+    _config = config
 
 
 def on_ask_ai():
@@ -17,6 +45,8 @@ def on_ask_ai():
         showInfo("Please open a card in review mode first.")
         return
 
+    from .ai_assistant import AIAssistantDialog
+
     # Get current card
     card = mw.reviewer.card
 
@@ -25,6 +55,18 @@ def on_ask_ai():
     dialog.exec()
 
 
+def on_open_settings():
+    """Open the settings dialog."""
+    from .settings import open_settings
+    open_settings()
+
+
+def on_batch_ai(browser):
+    """Open batch mode for the notes selected in the Browser."""
+    from .batch import on_batch_ai
+    on_batch_ai(browser)
+
+
 def setup_menu():
     """Add menu items to Anki's Tools menu."""
     # AI Assistant action
@@ -35,10 +77,19 @@ def setup_menu():
 
     # Settings action
     settings_action = QAction("AI Assistant Settings", mw)
-    settings_action.triggered.connect(open_settings)
+    settings_action.triggered.connect(on_open_settings)
     mw.form.menuTools.addAction(settings_action)
 
 
+def setup_browser_menu(browser):
+    """Add the batch action to the Browser's Notes menu."""
+    action = QAction("AI Batch Assistant...", browser)
+    action.setShortcut("Ctrl+Shift+B")
+    action.triggered.connect(lambda: on_batch_ai(browser))
+    browser.form.menu_Notes.addSeparator()
+    browser.form.menu_Notes.addAction(action)
+
+
 def add_reviewer_button(buttons, reviewer):
     """Add 'Ask AI' button to reviewer screen."""
     button = reviewer.bottom.web.eval(
@@ -74,19 +125,46 @@ def handle_reviewer_shortcuts(handled, shortcuts):
     shortcuts.append(("Ctrl+Shift+A", lambda: on_ask_ai()))
 
 
+def on_show_question(card):
+    """Prefetch answers for upcoming cards, if turned on."""
+    config = get_config()
+    if config.get("prefetch_enabled"):
+        from .prefetch import prefetch_upcoming
+        prefetch_upcoming(card, config)
+
+
+def on_profile_did_open():
+    """Deferred startup work, once the main window and collection are ready."""
+    # Apply Message Batch results that finished while Anki was closed
+    if os.path.exists(PENDING_BATCHES_FILE):
+        from .batch import start_message_batch_polling
+        start_message_batch_polling()
+
+    # Show welcome message on first run
+    if not get_config().get("api_key"):
+        tooltip("AI Card Assistant installed! Set up your API key in Tools → AI Assistant Settings", 5000)
+
+
 # Initialize add-on
 def init():
     """Initialize the add-on."""
     # Add menu items
     setup_menu()
 
+    # Keep the cached config current when it's edited from the Add-ons window
+    mw.addonManager.setConfigUpdatedAction(__name__, on_config_updated)
+
     # Add button to reviewer
     gui_hooks.reviewer_will_init_answer_buttons.append(add_reviewer_button)
 
-    # Show welcome message on first run
-    config = mw.addonManager.getConfig(__name__)
-    if not config or not config.get("api_key"):
-        tooltip("AI Card Assistant installed! Set up your API key in Tools → AI Assistant Settings", 5000)
+    # Prepare answers for the next cards while the user reviews (opt-in)
+    gui_hooks.reviewer_did_show_question.append(on_show_question)
+
+    # Add batch mode to the Browser
+    gui_hooks.browser_menus_did_init.append(setup_browser_menu)
+
+    # Pending batches and the welcome message wait for the profile
+    gui_hooks.profile_did_open.append(on_profile_did_open)
 
 
 # Run initialization
@@ -3,11 +3,140 @@ AI Assistant Dialog - Main UI for interacting with AI about cards
 """
 
 from aqt.qt import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-                     QTextEdit, QComboBox, QGroupBox, QMessageBox, Qt)
+                     QTextEdit, QTextCursor, QComboBox, QGroupBox, QMessageBox, Qt)
 from aqt.utils import showInfo, tooltip
 from aqt import mw
-import re
-from .api_client import call_ai_api, estimate_tokens
+import threading
+from .api_client import (Prompt, RequestCancelled, count_tokens, estimate_tokens,
+                         rate_limiter, stream_ai_api)
+from .html_text import html_to_text
+from .note_changes import NoteChanges
+from .response_cache import get_cache
+from .usage import estimate_cost, get_ledger
+
+
+ACTIONS = [
+    "Ask a custom question",
+    "Simplify the explanation",
+    "Add a practical example",
+    "Clarify a confusing part",
+    "Create a related card",
+    "Add mnemonics or memory aids",
+    "Explain like I'm 5",
+    "Add alternative explanations"
+]
+
+# Instruction appended to the card context for each preset action
+ACTION_INSTRUCTIONS = {
+    "Simplify the explanation": "Please rewrite the back of this card in simpler, more accessible language while keeping all the key information.",
+    "Add a practical example": "Please provide a practical, real-world example that illustrates this concept. Format it so I can add it to the card.",
+    "Clarify a confusing part": "Please identify any potentially confusing parts of this explanation and clarify them. If everything is clear, suggest ways to make it even clearer.",
+    "Create a related card": "Please suggest a related flashcard that would complement this one. Provide both the front (question) and back (answer) for a new card.",
+    "Add mnemonics or memory aids": "Please create a mnemonic, memory aid, or mental association to help remember this information.",
+    "Explain like I'm 5": "Please explain this concept in very simple terms, as if teaching it to a young child. Use analogies and simple language.",
+    "Add alternative explanations": "Please provide an alternative way to understand or explain this concept. Different perspectives help learning.",
+}
+
+
+def strip_html(text):
+    """Plain text of a field for display and prompts (see html_text)."""
+    return html_to_text(text)
+
+
+# Deck context: sample of other cards in the deck, in note id order
+CONTEXT_CARDS = 30
+CONTEXT_FIELD_CHARS = 300
+CONTEXT_MAX_CHARS = 12000
+
+_deck_contexts = {}
+
+
+def deck_context(col, did):
+    """
+    System prompt shared by every card in a deck.
+
+    Holds the instructions, the deck description and a sample of sibling
+    cards. It is built once per deck per session, so it is byte-identical
+    across requests and can be served from the API's prompt cache.
+    """
+    if did in _deck_contexts:
+        return _deck_contexts[did]
+
+    deck = col.decks.get(did) or {}
+    deck_name = deck.get("name", "")
+    parts = [
+        "You are a study assistant helping a student refine the flashcards in "
+        f"their Anki deck \"{deck_name}\". Keep answers accurate and concise, "
+        "and match the level and style of the deck."
+    ]
+
+    description = strip_html(deck.get("desc", ""))
+    if description:
+        parts.append(f"Deck description: {description}")
+
+    samples = []
+    size = 0
+    for note_id in sorted(col.find_notes(f"did:{did}"))[:CONTEXT_CARDS]:
+        fields = col.get_note(note_id).fields
+        if len(fields) < 2:
+            continue
+        sample = (f"Front: {strip_html(fields[0])[:CONTEXT_FIELD_CHARS]}\n"
+                  f"Back: {strip_html(fields[1])[:CONTEXT_FIELD_CHARS]}")
+        size += len(sample)
+        if size > CONTEXT_MAX_CHARS:
+            break
+        samples.append(sample)
+    if samples:
+        parts.append("Other cards in this deck, for context:\n\n" + "\n\n".join(samples))
+
+    _deck_contexts[did] = context = "\n\n".join(parts)
+    return context
+
+
+def build_card_prompt(action, front, back, context, tags, user_question=None):
+    """
+    Build the prompt for an action on one card.
+
+    Shared by the review dialog and batch mode so both send identical
+    prompts for the same card and action.
+
+    Args:
+        context: system prompt for the card's deck (see deck_context)
+
+    Returns:
+        Prompt with the deck context as its cached system part and the
+        card and request after it, or None if a custom question is empty
+    """
+    # Strip HTML for cleaner prompt
+    front_clean = strip_html(front)
+    back_clean = strip_html(back)
+    tags = " ".join(tags)
+
+    base_context = f"""I'm studying this flashcard from the deck.
+
+Card Front: {front_clean}
+
+Card Back: {back_clean}
+
+Tags: {tags}
+"""
+
+    if action == "Ask a custom question":
+        if not user_question:
+            return None
+        return Prompt(context, base_context + f"\nMy question: {user_question}\n\nPlease help me with this question about the card.")
+
+    return Prompt(context, base_context + "\n" + ACTION_INSTRUCTIONS[action])
+
+
+def back_field_edit(content, append):
+    """Note edit that replaces the back field or appends content to it."""
+    def edit(note):
+        if append:
+            note.fields[1] = note.fields[1] + "\n\n<hr>\n\n" + content
+        else:
+            note.fields[1] = content
+    return edit
 
 
 class AIAssistantDialog(QDialog):
@@ -18,6 +147,7 @@ class AIAssistantDialog(QDialog):
         self.card = card
         self.note = card.note()
         self.config = mw.addonManager.getConfig(__name__)
+        self._request = None  # token for the in-flight request, if any
 
         self.setup_ui()
         self.load_card_content()
@@ -39,6 +169,10 @@ class AIAssistantDialog(QDialog):
 
         self.back_display = QLabel()
         self.back_display.setWordWrap(True)
+
+        # Decoded text may contain "<"; never render it as HTML
+        self.front_display.setTextFormat(Qt.PlainText)
+        self.back_display.setTextFormat(Qt.PlainText)
         self.back_display.setStyleSheet("padding: 10px; background: #f0f0f0; border-radius: 4px;")
 
         card_layout.addWidget(QLabel("<b>Front:</b>"))
@@ -53,16 +187,7 @@ class AIAssistantDialog(QDialog):
         action_layout = QVBoxLayout()
 
         self.action_combo = QComboBox()
-        self.action_combo.addItems([
-            "Ask a custom question",
-            "Simplify the explanation",
-            "Add a practical example",
-            "Clarify a confusing part",
-            "Create a related card",
-            "Add mnemonics or memory aids",
-            "Explain like I'm 5",
-            "Add alternative explanations"
-        ])
+        self.action_combo.addItems(ACTIONS)
         self.action_combo.currentTextChanged.connect(self.on_action_changed)
         action_layout.addWidget(self.action_combo)
 
@@ -99,7 +224,7 @@ class AIAssistantDialog(QDialog):
         button_layout.addStretch()
 
         self.ask_button = QPushButton("Ask AI")
-        self.ask_button.clicked.connect(self.ask_ai)
+        self.ask_button.clicked.connect(lambda: self.ask_ai())
         self.ask_button.setStyleSheet("""
             QPushButton {
                 background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -115,6 +240,12 @@ class AIAssistantDialog(QDialog):
         """)
         button_layout.addWidget(self.ask_button)
 
+        self.regenerate_button = QPushButton("Regenerate")
+        self.regenerate_button.setToolTip("Ask again instead of using the cached response")
+        self.regenerate_button.clicked.connect(lambda: self.ask_ai(regenerate=True))
+        self.regenerate_button.setEnabled(False)
+        button_layout.addWidget(self.regenerate_button)
+
         self.apply_button = QPushButton("Apply to Card")
         self.apply_button.clicked.connect(self.apply_changes)
         self.apply_button.setEnabled(False)
@@ -150,7 +281,7 @@ class AIAssistantDialog(QDialog):
 
     def strip_html(self, text):
         """Remove HTML tags for display."""
-        return re.sub('<[^<]+?>', '', text).strip()
+        return strip_html(text)
 
     def on_action_changed(self, action):
         """Handle action selection change."""
@@ -166,60 +297,50 @@ class AIAssistantDialog(QDialog):
         """Build the prompt to send to AI."""
         action = self.action_combo.currentText()
 
-        # Strip HTML for cleaner prompt
-        front_clean = self.strip_html(self.front_text)
-        back_clean = self.strip_html(self.back_text)
-
-        # Get deck and tags for context
-        deck_name = mw.col.decks.name(self.card.did)
-        tags = " ".join(self.note.tags)
-
-        base_context = f"""I'm studying a flashcard from the deck "{deck_name}".
-
-Card Front: {front_clean}
-
-Card Back: {back_clean}
-
-Tags: {tags}
-"""
-
+        user_question = None
         if action == "Ask a custom question":
             user_question = self.question_input.toPlainText().strip()
             if not user_question:
                 return None
-            prompt = base_context + f"\nMy question: {user_question}\n\nPlease help me with this question about the card."
-
-        elif action == "Simplify the explanation":
-            prompt = base_context + "\nPlease rewrite the back of this card in simpler, more accessible language while keeping all the key information."
-
-        elif action == "Add a practical example":
-            prompt = base_context + "\nPlease provide a practical, real-world example that illustrates this concept. Format it so I can add it to the card."
-
-        elif action == "Clarify a confusing part":
-            prompt = base_context + "\nPlease identify any potentially confusing parts of this explanation and clarify them. If everything is clear, suggest ways to make it even clearer."
 
-        elif action == "Create a related card":
-            prompt = base_context + "\nPlease suggest a related flashcard that would complement this one. Provide both the front (question) and back (answer) for a new card."
+        # Deck context (shared, cached) and tags
+        context = deck_context(mw.col, self.card.did)
 
-        elif action == "Add mnemonics or memory aids":
-            prompt = base_context + "\nPlease create a mnemonic, memory aid, or mental association to help remember this information."
+        return build_card_prompt(action, self.front_text, self.back_text,
+                                 context, self.note.tags, user_question)
 
-        elif action == "Explain like I'm 5":
-            prompt = base_context + "\nPlease explain this concept in very simple terms, as if teaching it to a young child. Use analogies and simple language."
+    def ask_ai(self, regenerate=False):
+        """
+        Send request to AI without blocking the UI (or cancel one in flight).
 
-        elif action == "Add alternative explanations":
-            prompt = base_context + "\nPlease provide an alternative way to understand or explain this concept. Different perspectives help learning."
-
-        return prompt
+        A response cached for the same prompt, model and max tokens is shown
+        straight away unless regenerate is set.
+        """
+        if self._request is not None:
+            self.cancel_request()
+            return
 
-    def ask_ai(self):
-        """Send request to AI."""
         # Build prompt
         prompt = self.build_prompt()
         if not prompt:
             showInfo("Please enter a question.")
             return
 
+        api_key = self.config.get("api_key")
+        model = self.config.get("model", "claude-sonnet-4-20250514")
+        max_tokens = self.config.get("max_tokens", 1024)
+
+        cache = get_cache(self.config)
+        if cache is not None and not regenerate:
+            cached = cache.get(prompt, model, max_tokens)
+            if cached is not None:
+                self.response_display.setPlainText(cached)
+                self.apply_button.setEnabled(True)
+                self.regenerate_button.setEnabled(True)
+                self.cost_label.setText("Cached response: $0.00")
+                tooltip("Cached response - click Regenerate for a new one", 2000)
+                return
+
         # Check API key
         if not self.config.get("api_key"):
             QMessageBox.warning(
@@ -230,42 +351,116 @@ Tags: {tags}
             )
             return
 
-        # Estimate cost
-        tokens = estimate_tokens(prompt)
-        cost = tokens * 0.000003  # Approximate cost
-        self.cost_label.setText(f"Estimated cost: ${cost:.4f}")
-
-        # Disable button
-        self.ask_button.setEnabled(False)
-        self.ask_button.setText("Thinking...")
-
-        try:
-            # Call API
-            response = call_ai_api(
-                prompt,
-                self.config.get("api_key"),
-                self.config.get("model", "claude-sonnet-4-20250514"),
-                self.config.get("max_tokens", 1024)
-            )
+        # Estimate cost: the prompt plus a full max_tokens response
+        cost = estimate_cost(model, estimate_tokens(prompt), max_tokens)
+        self.cost_label.setText(f"Estimated cost: up to ${cost:.4f}")
+
+        precheck = self.config.get("precheck_token_count", False)
+        deck_name = mw.col.decks.name(self.card.did)
+        ledger = get_ledger()
+        spent = {}
+
+        rate_limiter.configure(self.config.get("requests_per_minute", 50))
+
+        # The button doubles as "Cancel" while the request runs
+        self._request = request = threading.Event()
+        self.ask_button.setText("Cancel")
+        self.apply_button.setEnabled(False)
+        self.regenerate_button.setEnabled(False)
+        self.response_display.clear()
+        self.response_display.setPlaceholderText("Thinking...")
+
+        def show_delta(text):
+            # Main thread: append streamed text unless the request was dropped
+            if self._request is request:
+                self.response_display.moveCursor(QTextCursor.End)
+                self.response_display.insertPlainText(text)
+
+        def show_input_tokens(input_tokens):
+            # Main thread: replace the rough estimate with the exact count
+            if self._request is request:
+                cost = estimate_cost(model, input_tokens, max_tokens)
+                self.cost_label.setText(
+                    f"Estimated cost: up to ${cost:.4f} ({input_tokens} input tokens)")
+
+        def record_usage(usage):
+            # Background thread: the ledger is thread-safe
+            spent["usage"] = usage
+            spent["cost"] = ledger.record(model, deck_name, usage)
+
+        def on_text(text):
+            # Background thread: stop reading once cancelled
+            if request.is_set():
+                raise RequestCancelled()
+            mw.taskman.run_on_main(lambda: show_delta(text))
+
+        def task():
+            # Runs on a background thread; must not touch Qt widgets
+            if precheck:
+                input_tokens = count_tokens(prompt, api_key, model, cancel_event=request)
+                mw.taskman.run_on_main(lambda: show_input_tokens(input_tokens))
+            response = stream_ai_api(prompt, api_key, on_text, model, max_tokens,
+                                     cancel_event=request, on_usage=record_usage)
+            if cache is not None:
+                cache.put(prompt, model, max_tokens, response)
+            return response
+
+        def on_done(future):
+            # Back on the main thread; ignore results nobody is waiting for
+            if self._request is not request:
+                return
+            self._request = None
+            self.reset_ask_button()
+
+            if "cost" in spent:
+                usage = spent["usage"]
+                self.cost_label.setText(
+                    f"Cost: ${spent['cost']:.4f} ({usage['input_tokens']} in / "
+                    f"{usage['output_tokens']} out tokens; prompt cache: "
+                    f"{usage['cache_read_input_tokens']} read, "
+                    f"{usage['cache_creation_input_tokens']} written)")
+
+            try:
+                response = future.result()
+            except RequestCancelled:
+                return
+            except Exception as e:
+                QMessageBox.critical(
+                    self,
+                    "Error",
+                    f"Failed to get AI response:\n\n{str(e)}\n\n"
+                    "Please check your API key and internet connection."
+                )
+                self.response_display.setPlainText(f"Error: {str(e)}")
+                return
 
             # Display response
             self.response_display.setPlainText(response)
             self.apply_button.setEnabled(True)
+            self.regenerate_button.setEnabled(True)
 
             tooltip("Response received!", 2000)
 
-        except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"Failed to get AI response:\n\n{str(e)}\n\n"
-                "Please check your API key and internet connection."
-            )
-            self.response_display.setPlainText(f"Error: {str(e)}")
+        mw.taskman.run_in_background(task, on_done)
 
-        finally:
-            self.ask_button.setEnabled(True)
-            self.ask_button.setText("Ask AI")
+    def cancel_request(self):
+        """Stop waiting for the in-flight request; its result is discarded."""
+        if self._request is None:
+            return
+        self._request.set()
+        self._request = None
+        self.reset_ask_button()
+        tooltip("Request cancelled", 1500)
+
+    def reset_ask_button(self):
+        """Restore the Ask button and placeholder after a request ends."""
+        self.ask_button.setText("Ask AI")
+        self.response_display.setPlaceholderText("AI response will appear here...")
+
+    def reject(self):
+        """Closing the dialog cancels any pending request."""
+        self.cancel_request()
+        super().reject()
 
     def apply_changes(self):
         """Apply AI suggestions to card."""
@@ -299,20 +494,16 @@ Tags: {tags}
         """Modify the current card."""
         # Update back field (index 1)
         if len(self.note.fields) > 1:
-            if append:
-                self.note.fields[1] = self.back_text + "\n\n<hr>\n\n" + content
-            else:
-                self.note.fields[1] = content
+            changes = NoteChanges("AI Card Assistant: Update Card")
+            changes.edit(self.note.id, back_field_edit(content, append))
 
-            # Save
-            self.note.flush()
-            mw.col.reset()
+            def on_success(_changes):
+                # Update display; the reviewer refreshes the card itself
+                self.note = mw.col.get_note(self.note.id)
+                self.load_card_content()
+                tooltip("Card updated!", 2000)
 
-            # Update display
-            self.load_card_content()
-
-            tooltip("Card updated!", 2000)
-            showInfo("Card has been updated. The changes will appear on next review.")
+            changes.commit(self, on_success)
 
     def create_new_card(self, content):
         """Create a new related card."""
@@ -356,9 +547,12 @@ Tags: {tags}
         if self.config.get("auto_tag_ai_cards", True):
             new_note.tags.append("ai-generated")
 
-        # Add to collection
-        mw.col.addNote(new_note)
-        mw.col.reset()
+        # Add to the current card's deck
+        changes = NoteChanges("AI Card Assistant: Create Card")
+        changes.add(new_note, self.card.did)
+
+        def on_success(_changes):
+            tooltip("New card created!", 2000)
+            showInfo(f"New related card created!\n\nFront: {front[:100]}...")
 
-        tooltip("New card created!", 2000)
-        showInfo(f"New related card created!\n\nFront: {front[:100]}...")
+        changes.commit(self, on_success)
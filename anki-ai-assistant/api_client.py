@@ -2,44 +2,174 @@
 API Client for communicating with AI providers (Anthropic Claude)
 """
 
+import http.client
 import json
-import urllib.request
-import urllib.error
+import random
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from . import http_pool
+
+
+# A prompt whose system part (e.g. deck context shared by many cards) is
+# marked for prompt caching. Accepted anywhere a prompt string is.
+Prompt = namedtuple("Prompt", "system text")
 
 
 def estimate_tokens(text):
-    """Rough estimation of tokens (4 chars ≈ 1 token)."""
+    """
+    Rough estimation of tokens (4 chars ≈ 1 token).
+
+    Only for quick estimates; count_tokens() gives the exact figure and
+    every response reports real usage.
+    """
+    if isinstance(text, Prompt):
+        return (len(text.system) + len(text.text)) // 4
     return len(text) // 4
 
 
-def call_ai_api(prompt, api_key, model="claude-sonnet-4-20250514", max_tokens=1024):
+API_URL = "https://api.anthropic.com/v1/messages"
+COUNT_TOKENS_URL = "https://api.anthropic.com/v1/messages/count_tokens"
+BATCHES_URL = "https://api.anthropic.com/v1/messages/batches"
+DEFAULT_MODEL = "claude-sonnet-4-20250514"
+REQUEST_TIMEOUT = 30
+
+# Errors raised by the socket/HTTP layer before a usable response arrives
+NETWORK_ERRORS = (OSError, http.client.HTTPException)
+
+
+# Token counts reported in a response's "usage" object
+USAGE_FIELDS = ("input_tokens", "output_tokens",
+                "cache_creation_input_tokens", "cache_read_input_tokens")
+
+# Rate limited (429), overloaded (529) and transient server errors are retried
+RETRY_STATUSES = {429, 500, 502, 503, 504, 529}
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0       # seconds; doubled on every attempt
+BACKOFF_MAX = 30.0
+MAX_RETRY_WAIT = 120.0   # seconds; a server asking for longer fails the request
+
+DEFAULT_REQUESTS_PER_MINUTE = 50
+DEFAULT_BURST = 5
+
+
+class RequestCancelled(Exception):
+    """Raised inside a streaming request when the caller asked it to stop."""
+
+
+def _sleep(seconds, cancel_event=None):
+    """Sleep, waking early with RequestCancelled if cancel_event is set."""
+    if cancel_event is None:
+        time.sleep(seconds)
+    elif cancel_event.wait(seconds):
+        raise RequestCancelled()
+
+
+class RateLimiter:
     """
-    Call Anthropic Claude API.
+    Token bucket shared by every request the add-on sends.
 
-    Args:
-        prompt: The prompt to send
-        api_key: Anthropic API key
-        model: Model to use
-        max_tokens: Maximum response tokens
+    Refills at requests_per_minute / 60 tokens a second, holding at most
+    burst tokens. pause() stops everyone until the server's rate limit
+    window resets, so concurrent batch requests back off together instead
+    of each hitting 429 in turn.
 
-    Returns:
-        String response from AI
+    Background requests (prefetch) only take a token when at least half the
+    bucket would be left for requests someone is waiting on, so they use
+    spare capacity and never hold up the dialog or batch mode.
+    """
 
-    Raises:
-        Exception: If API call fails
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, burst=DEFAULT_BURST):
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self.configure(requests_per_minute, burst)
+
+    def configure(self, requests_per_minute, burst=DEFAULT_BURST):
+        with self._lock:
+            self.rate = max(1, requests_per_minute) / 60.0
+            self.capacity = max(1, min(burst, requests_per_minute))
+            self._tokens = min(self._tokens, self.capacity)
+
+    def acquire(self, cancel_event=None, background=False):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                needed = 1 + (self.capacity // 2 if background else 0)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._tokens >= needed:
+                        self._tokens -= 1
+                        return
+                    wait = (needed - self._tokens) / self.rate
+            _sleep(wait, cancel_event)
+
+    def pause(self, seconds):
+        """Hold back all requests for the next `seconds`."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+# Shared by the review dialog, batch mode and the settings dialog
+rate_limiter = RateLimiter()
+
+
+def _seconds_until(timestamp):
+    """Seconds from now until an RFC 3339 timestamp (None if unparseable)."""
+    try:
+        reset = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return max(0.0, (reset - datetime.now(timezone.utc)).total_seconds())
+
+
+def _rate_limit_reset(headers):
     """
-    if not api_key:
-        raise Exception("No API key configured")
+    Seconds until an exhausted anthropic-ratelimit-* bucket refills, or None
+    if no bucket is exhausted.
+    """
+    waits = []
+    for bucket in ("requests", "tokens", "input-tokens", "output-tokens"):
+        if headers.get(f"anthropic-ratelimit-{bucket}-remaining") == "0":
+            wait = _seconds_until(headers.get(f"anthropic-ratelimit-{bucket}-reset"))
+            if wait is not None:
+                waits.append(wait)
+    return max(waits) if waits else None
 
-    # Prepare request
-    url = "https://api.anthropic.com/v1/messages"
 
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key,
-        "anthropic-version": "2023-06-01"
-    }
+def retry_delay(attempt, headers):
+    """
+    How long to wait before retry number `attempt` (0-based).
 
+    Uses the server's retry-after or rate limit reset time in full when
+    given, otherwise exponential backoff capped at BACKOFF_MAX. Both are
+    jittered so concurrent requests don't retry in lockstep.
+    """
+    retry_after = headers.get("retry-after")
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = _rate_limit_reset(headers)
+    if delay is not None:
+        return delay + random.uniform(0, 1)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _usage(payload):
+    """Token counts from a response's usage object, missing fields as 0."""
+    usage = payload.get("usage") or {}
+    return {field: usage.get(field) or 0 for field in USAGE_FIELDS}
+
+
+def _message_params(prompt, model, max_tokens):
+    """Messages API request body for a single-turn prompt (str or Prompt)."""
     data = {
         "model": model,
         "max_tokens": max_tokens,
@@ -50,51 +180,343 @@ def call_ai_api(prompt, api_key, model="claude-sonnet-4-20250514", max_tokens=10
             }
         ]
     }
+    if isinstance(prompt, Prompt):
+        # The system prefix comes first and is cached; the card-specific
+        # text after the cache breakpoint is billed in full
+        data["system"] = [
+            {
+                "type": "text",
+                "text": prompt.system,
+                "cache_control": {"type": "ephemeral"}
+            }
+        ]
+        data["messages"][0]["content"] = prompt.text
+    return data
 
-    # Make request
-    try:
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(data).encode('utf-8'),
-            headers=headers,
-            method='POST'
-        )
 
-        with urllib.request.urlopen(req, timeout=30) as response:
-            response_data = json.loads(response.read().decode('utf-8'))
+def _post_message(prompt, api_key, model, max_tokens, api_url, stream=False,
+                  cancel_event=None, count_only=False, background=False):
+    """
+    POST a Messages API request (see _send).
+
+    Returns:
+        http_pool.PooledResponse with a 2xx status (caller closes it)
+    """
+    data = _message_params(prompt, model, max_tokens)
+    if count_only:
+        del data["max_tokens"]
+    if stream:
+        data["stream"] = True
+    return _send("POST", api_url, api_key, data, stream=stream, cancel_event=cancel_event,
+                 background=background)
 
-            # Extract text from response
-            if 'content' in response_data and len(response_data['content']) > 0:
-                return response_data['content'][0]['text']
-            else:
-                raise Exception("Unexpected response format")
 
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8')
+def _send(method, url, api_key, data=None, stream=False, cancel_event=None, background=False):
+    """
+    Send an API request over a pooled keep-alive connection.
+
+    Requests are paced by rate_limiter and retried with backoff on
+    RETRY_STATUSES, unless the server asks for a wait longer than
+    MAX_RETRY_WAIT. Setting cancel_event while waiting raises
+    RequestCancelled.
+
+    Args:
+        data: JSON request body, or None
+        background: pace as a background request (see RateLimiter)
+
+    Returns:
+        http_pool.PooledResponse with a 2xx status (caller closes it)
+    """
+    if not api_key:
+        raise Exception("No API key configured")
+
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01"
+    }
+    if stream:
+        headers["Accept"] = "text/event-stream"
+
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiter.acquire(cancel_event, background)
         try:
-            error_data = json.loads(error_body)
-            error_msg = error_data.get('error', {}).get('message', str(e))
-        except:
-            error_msg = f"HTTP {e.code}: {error_body}"
-
-        if e.code == 401:
-            raise Exception("Invalid API key. Please check your API key in settings.")
-        elif e.code == 429:
-            raise Exception("Rate limit exceeded. Please try again in a moment.")
+            response = http_pool.request(
+                method,
+                url,
+                body=body,
+                headers=headers,
+                timeout=REQUEST_TIMEOUT
+            )
+            if response.status < 400:
+                # Out of requests for this window: hold the next ones back
+                reset = _rate_limit_reset(response.headers)
+                if reset:
+                    rate_limiter.pause(reset)
+                return response
+            with response:
+                error_body = response.read().decode('utf-8', 'replace')
+
+        except NETWORK_ERRORS as e:
+            raise Exception(f"Network error: {str(e)}. Please check your internet connection.")
+
+        if response.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            _raise_api_error(response.status, error_body)
+        delay = retry_delay(attempt, response.headers)
+        if delay > MAX_RETRY_WAIT:
+            raise Exception(f"The API asked to wait {delay:.0f} seconds before retrying "
+                            f"(HTTP {response.status}). Please try again later.")
+        if response.status == 429:
+            rate_limiter.pause(delay)
+        _sleep(delay, cancel_event)
+
+
+def _read_json(response):
+    """Read and close a JSON response."""
+    try:
+        with response:
+            return json.loads(response.read().decode('utf-8'))
+
+    except NETWORK_ERRORS as e:
+        raise Exception(f"Network error: {str(e)}. Please check your internet connection.")
+
+    except json.JSONDecodeError as e:
+        raise Exception(f"Invalid response from API: {str(e)}")
+
+
+def _raise_api_error(status, error_body):
+    """Turn an HTTP error response into the user-facing exception."""
+    try:
+        error_data = json.loads(error_body)
+        error_msg = error_data.get('error', {}).get('message', f"HTTP {status}")
+    except:
+        error_msg = f"HTTP {status}: {error_body}"
+
+    if status == 401:
+        raise Exception("Invalid API key. Please check your API key in settings.")
+    elif status == 429:
+        raise Exception("Rate limit exceeded. Please try again in a moment.")
+    elif status == 529:
+        raise Exception("The API is overloaded. Please try again in a moment.")
+    else:
+        raise Exception(f"API Error: {error_msg}")
+
+
+def call_ai_api(prompt, api_key, model=DEFAULT_MODEL, max_tokens=1024, api_url=API_URL,
+                cancel_event=None, on_usage=None, background=False):
+    """
+    Call Anthropic Claude API.
+
+    Args:
+        prompt: The prompt to send (str or Prompt)
+        api_key: Anthropic API key
+        model: Model to use
+        max_tokens: Maximum response tokens
+        api_url: Messages endpoint (overridable for testing)
+        cancel_event: threading.Event that aborts rate limit/retry waits
+        on_usage: called with the response's token counts (see USAGE_FIELDS)
+        background: yield to other requests for rate limit capacity
+
+    Returns:
+        String response from AI
+
+    Raises:
+        Exception: If API call fails
+    """
+    response = _post_message(prompt, api_key, model, max_tokens, api_url,
+                             cancel_event=cancel_event, background=background)
+    response_data = _read_json(response)
+
+    if on_usage:
+        on_usage(_usage(response_data))
+
+    return _message_text(response_data)
+
+
+def _message_text(message):
+    """Text of a Messages API response."""
+    # Extract text from response
+    if 'content' in message and len(message['content']) > 0:
+        return message['content'][0]['text']
+    else:
+        raise Exception("Unexpected error: Unexpected response format")
+
+
+def iter_sse_events(lines):
+    """
+    Parse a server-sent event stream.
+
+    Args:
+        lines: iterable of raw byte lines (e.g. an HTTP response)
+
+    Yields:
+        (event, data) tuples, one per blank-line-terminated event
+    """
+    event = None
+    data = []
+    for raw in lines:
+        line = raw.decode('utf-8').rstrip('\r\n')
+        if not line:
+            if data:
+                yield event or "message", "\n".join(data)
+            event = None
+            data = []
+        elif line.startswith(':'):
+            continue  # comment / keep-alive
         else:
-            raise Exception(f"API Error: {error_msg}")
+            field, _, value = line.partition(':')
+            if value.startswith(' '):
+                value = value[1:]
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+    if data:
+        yield event or "message", "\n".join(data)
+
+
+def stream_ai_api(prompt, api_key, on_text, model=DEFAULT_MODEL, max_tokens=1024,
+                  api_url=API_URL, cancel_event=None, on_usage=None):
+    """
+    Call the Claude API with streaming enabled.
+
+    on_text(delta) is called with each text fragment as it arrives (on the
+    calling thread). It may raise RequestCancelled to stop reading; the
+    connection is closed and RequestCancelled propagates to the caller.
+    Setting cancel_event does the same while waiting to send or retry.
+    on_usage(usage) is called once the stream ends with its token counts.
+
+    Returns:
+        The complete response text
+
+    Raises:
+        Exception: If the API call fails
+    """
+    response = _post_message(prompt, api_key, model, max_tokens, api_url, stream=True,
+                             cancel_event=cancel_event)
+    parts = []
+    usage = dict.fromkeys(USAGE_FIELDS, 0)
+    stream_error = None
+
+    try:
+        # Read to the end of the stream (past message_stop) so the
+        # connection can go back to the pool
+        with response:
+            for event, data in iter_sse_events(response):
+                if event == "ping":
+                    continue
+                payload = json.loads(data)
+                if event == "message_start":
+                    usage.update(_usage(payload.get("message", {})))
+                elif event == "message_delta":
+                    # Cumulative output count for the whole message
+                    usage["output_tokens"] = _usage(payload)["output_tokens"]
+                elif event == "content_block_delta":
+                    delta = payload.get("delta", {})
+                    if delta.get("type") == "text_delta":
+                        parts.append(delta["text"])
+                        on_text(delta["text"])
+                elif event == "error":
+                    stream_error = payload.get("error", {}).get("message", data)
+                    break
 
-    except urllib.error.URLError as e:
+    except NETWORK_ERRORS as e:
         raise Exception(f"Network error: {str(e)}. Please check your internet connection.")
 
     except json.JSONDecodeError as e:
         raise Exception(f"Invalid response from API: {str(e)}")
 
-    except Exception as e:
-        raise Exception(f"Unexpected error: {str(e)}")
+    if on_usage:
+        on_usage(usage)
+    if stream_error is not None:
+        raise Exception(f"API Error: {stream_error}")
+    if not parts:
+        raise Exception("Unexpected error: Unexpected response format")
+    return "".join(parts)
+
+
+def count_tokens(prompt, api_key, model=DEFAULT_MODEL, api_url=COUNT_TOKENS_URL,
+                 cancel_event=None):
+    """
+    Count a prompt's input tokens exactly (the count_tokens endpoint is free).
+
+    Returns:
+        int number of input tokens
+    """
+    response = _post_message(prompt, api_key, model, None, api_url,
+                             cancel_event=cancel_event, count_only=True)
+    return _read_json(response)["input_tokens"]
+
+
+def create_message_batch(prompts, api_key, model=DEFAULT_MODEL, max_tokens=1024,
+                         api_url=BATCHES_URL):
+    """
+    Submit prompts as one Message Batch (processed asynchronously at half price).
+
+    Args:
+        prompts: {custom_id: prompt}; ids must match [a-zA-Z0-9_-]{1,64}
+
+    Returns:
+        The batch object (a dict with "id" and "processing_status")
+    """
+    data = {
+        "requests": [
+            {"custom_id": custom_id, "params": _message_params(prompt, model, max_tokens)}
+            for custom_id, prompt in prompts.items()
+        ]
+    }
+    return _read_json(_send("POST", api_url, api_key, data))
+
+
+def get_message_batch(batch_id, api_key, api_url=BATCHES_URL):
+    """
+    Fetch a Message Batch's status.
+
+    Returns:
+        The batch object; "processing_status" is "ended" once results are
+        available at "results_url"
+    """
+    return _read_json(_send("GET", f"{api_url}/{batch_id}", api_key))
+
+
+def iter_batch_results(results_url, api_key):
+    """
+    Download the results of an ended Message Batch.
+
+    Yields:
+        (custom_id, text, error, usage): text is None and error a message
+        for requests that failed, were cancelled or expired
+    """
+    response = _send("GET", results_url, api_key)
+    try:
+        with response:
+            for line in response:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                result = entry.get("result", {})
+                if result.get("type") == "succeeded":
+                    message = result["message"]
+                    content = message.get("content") or [{}]
+                    text = content[0].get("text")
+                    if text is None:
+                        yield entry["custom_id"], None, "Unexpected response format", _usage(message)
+                    else:
+                        yield entry["custom_id"], text, None, _usage(message)
+                else:
+                    error = result.get("error", {}).get("error", {}).get("message")
+                    yield entry["custom_id"], None, error or result.get("type", "failed"), None
+
+    except NETWORK_ERRORS as e:
+        raise Exception(f"Network error: {str(e)}. Please check your internet connection.")
+
+    except json.JSONDecodeError as e:
+        raise Exception(f"Invalid response from API: {str(e)}")
 
 
-def test_api_key(api_key, model="claude-sonnet-4-20250514"):
+def test_api_key(api_key, model=DEFAULT_MODEL):
     """
     Test if API key is valid.
 
@@ -0,0 +1,370 @@
+"""
+Batch mode - run one AI action over many notes selected in the Browser
+"""
+
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from aqt.qt import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                     QComboBox, QGroupBox, QSpinBox, QRadioButton, QCheckBox,
+                     QMessageBox)
+from aqt.utils import showInfo, tooltip
+from aqt import mw
+from .ai_assistant import ACTIONS, back_field_edit, build_card_prompt, deck_context
+from .api_client import RequestCancelled, call_ai_api, rate_limiter
+from .message_batches import POLL_INTERVAL, check_job, get_job_store, submit_job
+from .note_changes import NoteChanges
+from .response_cache import get_cache
+from .usage import get_ledger
+
+
+# Actions that rewrite or extend the back of an existing card
+BATCH_ACTIONS = [action for action in ACTIONS
+                 if action not in ("Ask a custom question", "Create a related card")]
+
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+
+
+def run_batch(prompts, api_key, model, max_tokens, concurrency,
+              on_progress=None, cancel_event=None, cache=None, regenerate=False,
+              on_usage=None):
+    """
+    Send prompts concurrently through a bounded thread pool.
+
+    Args:
+        prompts: {note_id: prompt}
+        concurrency: maximum number of requests in flight
+        on_progress: called as on_progress(done, total) after each request
+        cancel_event: threading.Event; requests not yet started are skipped
+            once it is set
+        cache: ResponseCache; cached responses are reused (unless
+            regenerate is set) and new responses are stored in it
+        on_usage: called as on_usage(note_id, usage) from worker threads with
+            the token counts of each API response
+
+    Returns:
+        (results, errors): {note_id: response text}, {note_id: error message}
+    """
+    results = {}
+    errors = {}
+    total = len(prompts)
+
+    def call(note_id, prompt):
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        if cache is not None and not regenerate:
+            cached = cache.get(prompt, model, max_tokens)
+            if cached is not None:
+                return cached
+        response = call_ai_api(
+            prompt, api_key, model, max_tokens, cancel_event=cancel_event,
+            on_usage=on_usage and (lambda usage: on_usage(note_id, usage)))
+        if cache is not None:
+            cache.put(prompt, model, max_tokens, response)
+        return response
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(call, note_id, prompt): note_id
+                   for note_id, prompt in prompts.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            note_id = futures[future]
+            try:
+                response = future.result()
+                if response is not None:
+                    results[note_id] = response
+            except RequestCancelled:
+                pass
+            except Exception as e:
+                errors[note_id] = str(e)
+            if on_progress:
+                on_progress(done, total)
+
+    return results, errors
+
+
+class BatchDialog(QDialog):
+    """Dialog for running an AI action over the notes selected in the Browser."""
+
+    def __init__(self, browser, note_ids):
+        super().__init__(browser)
+        self.browser = browser
+        self.note_ids = list(note_ids)
+        self.note_decks = {}
+        self.config = mw.addonManager.getConfig(__name__)
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Set up the dialog UI."""
+        self.setWindowTitle("AI Batch Assistant")
+        self.setMinimumWidth(450)
+
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel(f"<b>{len(self.note_ids)}</b> notes selected"))
+
+        # Action selection
+        action_group = QGroupBox("Action")
+        action_layout = QVBoxLayout()
+        self.action_combo = QComboBox()
+        self.action_combo.addItems(BATCH_ACTIONS)
+        action_layout.addWidget(self.action_combo)
+
+        self.replace_radio = QRadioButton("Replace the back of each card")
+        self.append_radio = QRadioButton("Append to the back of each card")
+        self.append_radio.setChecked(True)
+        action_layout.addWidget(self.replace_radio)
+        action_layout.addWidget(self.append_radio)
+
+        action_group.setLayout(action_layout)
+        layout.addWidget(action_group)
+
+        # Concurrency
+        concurrency_layout = QHBoxLayout()
+        concurrency_layout.addWidget(QLabel("Parallel requests:"))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, MAX_CONCURRENCY)
+        self.concurrency_spin.setValue(self.config.get("batch_concurrency", DEFAULT_CONCURRENCY))
+        concurrency_layout.addWidget(self.concurrency_spin)
+        concurrency_layout.addStretch()
+        layout.addLayout(concurrency_layout)
+
+        self.reuse_cache_checkbox = QCheckBox("Reuse cached responses")
+        self.reuse_cache_checkbox.setChecked(True)
+        self.reuse_cache_checkbox.setEnabled(self.config.get("cache_responses", True))
+        layout.addWidget(self.reuse_cache_checkbox)
+
+        self.message_batch_checkbox = QCheckBox(
+            "Send as a Message Batch (half price, results applied within 24 hours)")
+        self.message_batch_checkbox.toggled.connect(self.on_message_batch_toggled)
+        layout.addWidget(self.message_batch_checkbox)
+
+        # Buttons
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+
+        self.run_button = QPushButton("Run")
+        self.run_button.clicked.connect(self.run)
+        button_layout.addWidget(self.run_button)
+
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(cancel_button)
+
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def on_message_batch_toggled(self, checked):
+        """Message Batches are processed by the API, not in parallel here."""
+        self.concurrency_spin.setEnabled(not checked)
+        self.reuse_cache_checkbox.setEnabled(
+            not checked and self.config.get("cache_responses", True))
+
+    def build_prompts(self, action):
+        """Build {note_id: prompt} for the selected notes (main thread)."""
+        prompts = {}
+        for note_id in self.note_ids:
+            note = mw.col.get_note(note_id)
+            if len(note.fields) < 2:
+                continue
+            cards = note.cards()
+            if not cards:
+                continue
+            did = cards[0].did
+            self.note_decks[note_id] = mw.col.decks.name(did)
+            prompts[note_id] = build_card_prompt(action, note.fields[0], note.fields[1],
+                                                 deck_context(mw.col, did), note.tags)
+        return prompts
+
+    def run(self):
+        """Send all requests in the background, then apply the results."""
+        if not self.config.get("api_key"):
+            QMessageBox.warning(
+                self,
+                "API Key Required",
+                "Please set up your API key in Tools → AI Assistant Settings first."
+            )
+            return
+
+        action = self.action_combo.currentText()
+        append = self.append_radio.isChecked()
+        concurrency = self.concurrency_spin.value()
+        regenerate = not self.reuse_cache_checkbox.isChecked()
+        prompts = self.build_prompts(action)
+        if not prompts:
+            showInfo("None of the selected notes have a back field to work on.")
+            return
+
+        api_key = self.config.get("api_key")
+        model = self.config.get("model", "claude-sonnet-4-20250514")
+        max_tokens = self.config.get("max_tokens", 1024)
+
+        if self.message_batch_checkbox.isChecked():
+            self.accept()
+            submit_message_batch(self.browser, prompts, self.note_decks, action, append,
+                                 api_key, model, max_tokens)
+            return
+
+        cache = get_cache(self.config)
+        rate_limiter.configure(self.config.get("requests_per_minute", 50))
+        cancel_event = threading.Event()
+        note_decks = self.note_decks
+        ledger = get_ledger()
+        browser = self.browser
+        self.accept()
+
+        mw.progress.start(max=len(prompts), label=f"{action}...", parent=browser)
+
+        def on_progress(done, total):
+            def update():
+                if mw.progress.want_cancel():
+                    cancel_event.set()
+                mw.progress.update(label=f"{action}... {done}/{total}", value=done, max=total)
+            mw.taskman.run_on_main(update)
+
+        def task():
+            return run_batch(prompts, api_key, model, max_tokens, concurrency,
+                             on_progress, cancel_event, cache, regenerate,
+                             lambda note_id, usage: ledger.record(model, note_decks[note_id], usage))
+
+        def on_done(future):
+            mw.progress.finish()
+            try:
+                results, errors = future.result()
+            except Exception as e:
+                showInfo(f"Batch failed:\n\n{e}", parent=browser)
+                return
+            apply_results(browser, results, errors, append)
+
+        mw.taskman.run_in_background(task, on_done)
+
+
+def apply_results(parent, results, errors, append, on_applied=None, on_failed=None):
+    """
+    Write all responses to their notes in a single undoable operation.
+    on_applied() is called on the main thread once the notes are written,
+    on_failed() if writing them fails.
+    """
+    if not results:
+        message = "No notes were updated."
+        if errors:
+            message += f"\n\n{len(errors)} requests failed, e.g.:\n{next(iter(errors.values()))}"
+        showInfo(message, parent=parent)
+        if on_applied:
+            on_applied()
+        return
+
+    changes = NoteChanges("AI Batch Assistant")
+    for note_id, response in results.items():
+        changes.edit(note_id, back_field_edit(response, append))
+
+    def on_success(_changes):
+        message = f"Updated {len(results)} notes."
+        if errors:
+            message += f" {len(errors)} failed."
+        tooltip(message, 3000, parent=parent)
+        if on_applied:
+            on_applied()
+
+    def on_failure(exception):
+        showInfo(f"Updating the notes failed:\n\n{exception}", parent=parent)
+        on_failed()
+
+    changes.commit(parent, on_success, on_failure if on_failed else None)
+
+
+def submit_message_batch(parent, prompts, note_decks, action, append, api_key, model, max_tokens):
+    """Submit prompts as a Message Batch; results are applied by the poller."""
+    def task():
+        return submit_job(get_job_store(), prompts, note_decks, action, append,
+                          api_key, model, max_tokens)
+
+    def on_done(future):
+        mw.progress.finish()
+        try:
+            job = future.result()
+        except Exception as e:
+            showInfo(f"Couldn't submit the batch:\n\n{e}", parent=parent)
+            return
+        showInfo(
+            f"Submitted {len(prompts)} notes as batch {job['id']}.\n\n"
+            "Results are applied automatically when the batch finishes "
+            "(usually within an hour, at most 24 hours), even after restarting Anki.",
+            parent=parent
+        )
+        start_message_batch_polling()
+
+    mw.progress.start(label="Submitting batch...", parent=parent)
+    mw.taskman.run_in_background(task, on_done)
+
+
+_poll_timer = None
+_polling = False
+_applying = set()   # ids of finished jobs whose results are being written
+
+
+def finish_job(store, job, usages):
+    """Record a finished job's usage and drop it from the store."""
+    ledger = get_ledger()
+    for note_id, usage in usages.items():
+        ledger.record(job["model"], job["decks"].get(str(note_id), ""), usage, batch=True)
+    store.remove(job["id"])
+    _applying.discard(job["id"])
+
+
+def poll_message_batches():
+    """Check pending Message Batches in the background and apply finished ones."""
+    global _polling
+    store = get_job_store()
+    jobs = [job for job in store.jobs() if job["id"] not in _applying]
+    if not jobs or _polling:
+        return
+    config = mw.addonManager.getConfig(__name__) or {}
+    api_key = config.get("api_key")
+    if not api_key:
+        return
+    _polling = True
+
+    def task():
+        finished = []
+        for job in jobs:
+            try:
+                outcome = check_job(job, api_key)
+            except Exception:
+                continue  # network trouble; try again on the next poll
+            if outcome is not None:
+                finished.append((job, outcome))
+        return finished
+
+    def on_done(future):
+        global _polling
+        _polling = False
+        for job, (results, errors, usages) in future.result():
+            # the job is only forgotten (and its usage recorded) once its
+            # results are in the collection; until then polls skip it, and if
+            # writing them fails it is applied again on a later poll
+            _applying.add(job["id"])
+            apply_results(mw, results, errors, job["append"],
+                          functools.partial(finish_job, store, job, usages),
+                          functools.partial(_applying.discard, job["id"]))
+
+    mw.taskman.run_in_background(task, on_done)
+
+
+def start_message_batch_polling():
+    """Poll now and then every POLL_INTERVAL seconds while batches are pending."""
+    global _poll_timer
+    if _poll_timer is None and get_job_store().jobs():
+        _poll_timer = mw.progress.timer(POLL_INTERVAL * 1000, poll_message_batches, True,
+                                        parent=mw)
+    poll_message_batches()
+
+
+def on_batch_ai(browser):
+    """Open the batch dialog for the notes selected in the Browser."""
+    note_ids = browser.selected_notes()
+    if not note_ids:
+        showInfo("Select one or more notes first.", parent=browser)
+        return
+    BatchDialog(browser, note_ids).exec()
@@ -0,0 +1,106 @@
+"""
+HTML to plain text for prompts, display and search
+
+Shared by the add-on and generate-anki-packages.py, so it imports nothing
+but the standard library.
+"""
+
+import html
+import re
+from functools import lru_cache
+
+# One pass over the field: comments, tags, and the text between them
+_TOKEN = re.compile(r'<!--.*?(?:-->|$)|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*>', re.DOTALL)
+
+# Tags that start a new line of text
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'hr', 'li', 'ol', 'p', 'section', 'table', 'tr', 'ul',
+])
+# Tags whose content is not text
+SKIP_TAGS = frozenset(['script', 'style', 'head', 'title'])
+
+_WHITESPACE = re.compile(r'[ \t\r\n\f\v\xa0]+')
+_SPACE_AROUND_NEWLINE = re.compile(r' *\n *')
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+def _tidy(text):
+    """Normalize the whitespace of already-collapsed prose."""
+    text = _SPACE_AROUND_NEWLINE.sub('\n', text)
+    return _BLANK_LINES.sub('\n\n', text)
+
+
+@lru_cache(maxsize=4096)
+def html_to_text(source):
+    """
+    Convert a card field's HTML to compact plain text.
+
+    Entities are decoded and whitespace is collapsed; block tags become
+    line breaks and list items "- " lines. <pre> blocks are kept verbatim
+    as ``` fenced code, and inline <code> is wrapped in backticks. Results
+    are memoized, since the same fields are converted repeatedly.
+    """
+    segments = []      # finished (is_code, text) pieces
+    prose = []         # text since the last code block
+    code = None        # text of the <pre> block being read, if any
+    skip = None        # tag whose content is being skipped
+    pos = 0
+
+    for match in _TOKEN.finditer(source):
+        text = source[pos:match.start()]
+        pos = match.end()
+        if text and skip is None:
+            text = html.unescape(text)
+            if code is not None:
+                code.append(text)
+            else:
+                prose.append(_WHITESPACE.sub(' ', text))
+
+        closing, tag = match.group(1), match.group(2)
+        if tag is None:
+            continue  # comment
+        tag = tag.lower()
+
+        if skip is not None:
+            if closing and tag == skip:
+                skip = None
+        elif tag in SKIP_TAGS and not closing:
+            skip = tag
+        elif tag == 'pre':
+            if not closing and code is None:
+                segments.append((False, ''.join(prose)))
+                prose = []
+                code = []
+            elif closing and code is not None:
+                segments.append((True, ''.join(code).strip('\n')))
+                code = None
+        elif code is not None:
+            if tag == 'br':
+                code.append('\n')
+        elif tag == 'code':
+            prose.append('`')
+        elif tag == 'li':
+            if not closing:
+                prose.append('\n- ')
+        elif tag in BLOCK_TAGS:
+            prose.append('\n')
+
+    text = source[pos:]
+    if text and skip is None:
+        text = html.unescape(text)
+        if code is not None:
+            code.append(text)
+        else:
+            prose.append(_WHITESPACE.sub(' ', text))
+    if code is not None:
+        segments.append((True, ''.join(code).strip('\n')))
+    segments.append((False, ''.join(prose)))
+
+    parts = []
+    for is_code, text in segments:
+        text = f'```\n{text}\n```' if is_code else _tidy(text).strip()
+        if text:
+            parts.append(text)
+    return '\n'.join(parts)
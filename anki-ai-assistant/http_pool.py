@@ -0,0 +1,158 @@
+"""
+Keep-alive HTTP connection pool shared by every API call the add-on makes
+"""
+
+import http.client
+import ssl
+import threading
+import time
+import urllib.parse
+
+IDLE_TIMEOUT = 30        # seconds an idle connection is kept for reuse
+MAX_IDLE_PER_HOST = 8    # idle connections kept per host; extras are closed
+
+# Failures that mean a reused keep-alive connection was closed by the server
+# while idle. The request never reached it, so it is safe to send again.
+STALE_CONNECTION_ERRORS = (ConnectionError, http.client.BadStatusLine)
+
+
+class PooledResponse:
+    """
+    An HTTP response whose connection goes back to the pool on close().
+
+    The connection is only reused when the body was read to the end and
+    the server didn't ask to close it; otherwise it is closed.
+    """
+
+    def __init__(self, pool, key, conn, response):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+
+    @property
+    def status(self):
+        return self._response.status
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    def read(self, amt=None):
+        return self._response.read(amt)
+
+    def __iter__(self):
+        # Raw lines, as for a file object
+        return iter(self._response)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if not self._response.isclosed() and self._response.length == 0:
+            # Body consumed line by line; let http.client finish the response
+            self._response.read()
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool.release(self._key, conn)
+        else:
+            self._response.close()
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of HTTP(S) connections keyed by (scheme, host, port)."""
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, max_idle_per_host=MAX_IDLE_PER_HOST):
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl_context = None
+
+    def _connect(self, key, timeout):
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            return http.client.HTTPSConnection(host, port, timeout=timeout,
+                                               context=self._ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def acquire(self, key, timeout):
+        """Return (connection, reused), evicting connections idle too long."""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used < self.idle_timeout:
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+        return self._connect(key, timeout), False
+
+    def release(self, key, conn):
+        """Return a healthy connection to the pool."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def request(self, method, url, body=None, headers=None, timeout=30):
+        """
+        Send a request over a pooled connection.
+
+        A reused connection that turns out to be dead is dropped and the
+        request is retried on another one (eventually a fresh connection).
+
+        Returns:
+            PooledResponse - close it (or use it as a context manager)
+        """
+        parts = urllib.parse.urlsplit(url)
+        default_port = 443 if parts.scheme == "https" else 80
+        key = (parts.scheme, parts.hostname, parts.port or default_port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        while True:
+            conn, reused = self.acquire(key, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            return PooledResponse(self, key, conn, response)
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn, _ in connections:
+                conn.close()
+
+
+# Shared by the review dialog, batch mode and the settings dialog
+default_pool = ConnectionPool()
+
+
+def request(method, url, body=None, headers=None, timeout=30):
+    """Send a request through the shared pool (see ConnectionPool.request)."""
+    return default_pool.request(method, url, body, headers, timeout)
@@ -0,0 +1,126 @@
+"""
+Message Batches mode - submit many card prompts as one asynchronous batch
+
+The API processes a Message Batch within 24 hours at half the usual price
+and without counting against the interactive rate limits. Submitted batches
+are remembered in user_files so results are applied even after a restart.
+"""
+
+import json
+import os
+import threading
+import time
+
+from .api_client import BATCHES_URL, create_message_batch, get_message_batch, iter_batch_results
+from .response_cache import USER_FILES
+
+JOBS_FILE = os.path.join(USER_FILES, "message_batches.json")
+POLL_INTERVAL = 60  # seconds between status checks
+
+
+def custom_id(note_id):
+    return f"note-{note_id}"
+
+
+def note_id_from(custom_id):
+    return int(custom_id.split("-", 1)[1])
+
+
+class BatchJobStore:
+    """Submitted, not yet applied batch jobs, persisted as JSON."""
+
+    def __init__(self, path=JOBS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def jobs(self):
+        with self._lock:
+            return self._load()
+
+    def add(self, job):
+        with self._lock:
+            jobs = self._load()
+            jobs.append(job)
+            self._save(jobs)
+
+    def remove(self, batch_id):
+        with self._lock:
+            self._save([job for job in self._load() if job["id"] != batch_id])
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _save(self, jobs):
+        if not jobs:
+            # No file means nothing pending; startup checks only for the file
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(jobs, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def submit_job(store, prompts, note_decks, action, append, api_key, model, max_tokens,
+               api_url=BATCHES_URL):
+    """
+    Submit {note_id: prompt} as one Message Batch and remember it.
+
+    Returns:
+        The stored job: batch id, action, append, model, deck of each note
+        and submission time
+    """
+    batch = create_message_batch({custom_id(note_id): prompt for note_id, prompt in prompts.items()},
+                                 api_key, model, max_tokens, api_url)
+    job = {
+        "id": batch["id"],
+        "action": action,
+        "append": append,
+        "model": model,
+        "decks": {str(note_id): note_decks.get(note_id, "") for note_id in prompts},
+        "submitted": time.time(),
+    }
+    store.add(job)
+    return job
+
+
+def check_job(job, api_key, api_url=BATCHES_URL):
+    """
+    Fetch a job's results if its batch has ended.
+
+    Returns:
+        None while the batch is still processing, otherwise
+        (results, errors, usages): {note_id: text}, {note_id: message},
+        {note_id: usage}
+    """
+    batch = get_message_batch(job["id"], api_key, api_url)
+    if batch.get("processing_status") != "ended":
+        return None
+
+    results, errors, usages = {}, {}, {}
+    for result_id, text, error, usage in iter_batch_results(batch["results_url"], api_key):
+        note_id = note_id_from(result_id)
+        if text is not None:
+            results[note_id] = text
+        else:
+            errors[note_id] = error
+        if usage:
+            usages[note_id] = usage
+    return results, errors, usages
+
+
+_store = None
+
+
+def get_job_store():
+    """Return the shared job store."""
+    global _store
+    if _store is None:
+        _store = BatchJobStore()
+    return _store
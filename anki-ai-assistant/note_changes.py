@@ -0,0 +1,78 @@
+"""
+Queued note edits and additions, committed as one undoable collection operation
+"""
+
+from anki.errors import NotFoundError
+from aqt.operations import CollectionOp
+
+try:
+    from anki.collection import AddNoteRequest
+except ImportError:  # Anki < 2.1.55 has no add_notes()
+    AddNoteRequest = None
+
+
+class NoteChanges:
+    """
+    Collects note edits and new notes, then writes them all in a single
+    background operation with one undo entry.
+
+    Edits are functions applied to a freshly loaded note inside the
+    operation, so they can be queued from the main thread without loading
+    every note there. Anki refreshes only what the changes affect (e.g. the
+    card on screen) instead of resetting the collection.
+    """
+
+    def __init__(self, undo_label):
+        self.undo_label = undo_label
+        self._edits = {}   # note id -> [edit(note), ...]
+        self._added = []   # (note, deck id)
+
+    def edit(self, note_id, edit):
+        """Queue edit(note) for a note; several edits to one note are combined."""
+        self._edits.setdefault(note_id, []).append(edit)
+
+    def add(self, note, deck_id):
+        """Queue a new note for the given deck."""
+        self._added.append((note, deck_id))
+
+    def __len__(self):
+        return len(self._edits) + len(self._added)
+
+    def op(self, col):
+        """The collection operation (runs in the background)."""
+        undo_entry = col.add_custom_undo_entry(self.undo_label)
+
+        notes = []
+        for note_id, edits in self._edits.items():
+            try:
+                note = col.get_note(note_id)
+            except NotFoundError:
+                continue  # deleted since the edit was queued
+            for edit in edits:
+                edit(note)
+            notes.append(note)
+        if notes:
+            col.update_notes(notes)
+
+        if self._added:
+            if AddNoteRequest is not None:
+                col.add_notes([AddNoteRequest(note, deck_id) for note, deck_id in self._added])
+            else:
+                for note, deck_id in self._added:
+                    col.add_note(note, deck_id)
+
+        return col.merge_undo_entries(undo_entry)
+
+    def commit(self, parent, on_success=None, on_failure=None):
+        """
+        Run the queued changes; on_success(changes) is called on the main
+        thread. on_failure(exception), if given, replaces Anki's error dialog.
+        """
+        if not len(self):
+            return
+        op = CollectionOp(parent, self.op)
+        if on_success:
+            op = op.success(on_success)
+        if on_failure:
+            op = op.failure(on_failure)
+        op.run_in_background()
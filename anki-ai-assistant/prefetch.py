@@ -0,0 +1,138 @@
+"""
+Prefetch - ask about upcoming review cards in the background
+
+When enabled, every time the reviewer shows a question the next few
+scheduled cards are sent for a preset action and the responses are stored
+in the response cache, so the dialog can show them instantly.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from aqt import mw
+from .ai_assistant import ACTIONS, build_card_prompt, deck_context
+from .api_client import call_ai_api
+from .response_cache import USER_FILES, get_cache
+from .usage import get_ledger
+
+# Prefetching makes sense for preset actions only
+PREFETCH_ACTIONS = [action for action in ACTIONS if action != "Ask a custom question"]
+
+DEFAULT_ACTION = "Simplify the explanation"
+DEFAULT_CARDS = 3
+DEFAULT_CONCURRENCY = 1
+DEFAULT_DAILY_LIMIT = 50
+
+BUDGET_FILE = os.path.join(USER_FILES, "prefetch_budget.json")
+
+_lock = threading.Lock()
+_in_flight = set()   # card ids with a prefetch request running
+_executor = None
+_executor_workers = 0
+
+
+def _take_budget(limit):
+    """Count one prefetch request against today's limit; False if it's used up."""
+    today = date.today().isoformat()
+    try:
+        with open(BUDGET_FILE, encoding='utf-8') as f:
+            budget = json.load(f)
+    except (FileNotFoundError, ValueError):
+        budget = {}
+    if budget.get("day") != today:
+        budget = {"day": today, "requests": 0}
+    if budget["requests"] >= limit:
+        return False
+    budget["requests"] += 1
+    os.makedirs(USER_FILES, exist_ok=True)
+    with open(BUDGET_FILE, 'w', encoding='utf-8') as f:
+        json.dump(budget, f)
+    return True
+
+
+def upcoming_cards(count):
+    """The next `count` cards the scheduler will show after the current one."""
+    current = mw.reviewer.card.id if mw.reviewer and mw.reviewer.card else None
+    queued = mw.col.sched.get_queued_cards(fetch_limit=count + 1)
+    cards = [mw.col.get_card(entry.card.id) for entry in queued.cards
+             if entry.card.id != current]
+    return cards[:count]
+
+
+def prefetch_upcoming(card=None, config=None):
+    """
+    reviewer_did_show_question hook: start requests for the next cards.
+    config is the add-on's cached config; it is read from disk if not given.
+    """
+    global _executor, _executor_workers
+    if config is None:
+        config = mw.addonManager.getConfig(__name__) or {}
+    if not config.get("prefetch_enabled") or not config.get("api_key"):
+        return
+    cache = get_cache(config)
+    if cache is None:
+        return  # nowhere to keep the results
+
+    action = config.get("prefetch_action", DEFAULT_ACTION)
+    if action not in PREFETCH_ACTIONS:
+        return
+    concurrency = max(1, config.get("prefetch_concurrency", DEFAULT_CONCURRENCY))
+    daily_limit = config.get("prefetch_daily_limit", DEFAULT_DAILY_LIMIT)
+    api_key = config.get("api_key")
+    model = config.get("model", "claude-sonnet-4-20250514")
+    max_tokens = config.get("max_tokens", 1024)
+
+    try:
+        cards = upcoming_cards(config.get("prefetch_cards", DEFAULT_CARDS))
+    except Exception:
+        return  # scheduler without get_queued_cards, or no collection
+
+    if _executor is None or _executor_workers != concurrency:
+        # prefetch_concurrency changed: requests already running finish on
+        # the old pool
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=concurrency,
+                                       thread_name_prefix="ai-prefetch")
+        _executor_workers = concurrency
+
+    for upcoming in cards:
+        with _lock:
+            if upcoming.id in _in_flight:
+                continue
+            if len(_in_flight) >= concurrency:
+                return  # at the cap; later cards are tried on the next question
+
+        note = upcoming.note()
+        if len(note.fields) < 2:
+            continue
+        prompt = build_card_prompt(action, note.fields[0], note.fields[1],
+                                   deck_context(mw.col, upcoming.did), note.tags)
+        if cache.get(prompt, model, max_tokens) is not None:
+            continue
+        if not _take_budget(daily_limit):
+            return
+
+        with _lock:
+            _in_flight.add(upcoming.id)
+        deck_name = mw.col.decks.name(upcoming.did)
+        _executor.submit(_fetch, upcoming.id, prompt, deck_name, cache,
+                         api_key, model, max_tokens)
+
+
+def _fetch(card_id, prompt, deck_name, cache, api_key, model, max_tokens):
+    """Worker thread: fetch one response into the cache."""
+    ledger = get_ledger()
+    try:
+        response = call_ai_api(prompt, api_key, model, max_tokens,
+                               on_usage=lambda usage: ledger.record(model, deck_name, usage),
+                               background=True)
+        cache.put(prompt, model, max_tokens, response)
+    except Exception:
+        pass  # best effort; the dialog simply asks again
+    finally:
+        with _lock:
+            _in_flight.discard(card_id)
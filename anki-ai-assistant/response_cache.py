@@ -0,0 +1,146 @@
+"""
+Persistent cache of AI responses, keyed on prompt, model and max_tokens
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from .api_client import Prompt
+
+# Anki keeps an add-on's user_files folder when the add-on is updated
+USER_FILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_files")
+CACHE_FILE = os.path.join(USER_FILES, "response_cache.sqlite3")
+
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_MAX_MB = 20
+
+
+def cache_key(prompt, model, max_tokens):
+    """Hash of everything that determines the response to a prompt."""
+    if isinstance(prompt, Prompt):
+        prompt = f"{prompt.system}\0{prompt.text}"
+    data = f"{model}\0{max_tokens}\0{prompt}".encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache with least-recently-used eviction.
+
+    Entries are evicted oldest-use first once either max_entries or
+    max_bytes (total response size) is exceeded. Safe to share between
+    threads.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, prompt, model, max_tokens):
+        """Return the cached response, or None, marking it as recently used."""
+        key = cache_key(prompt, model, max_tokens)
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT response FROM responses WHERE key = ?",
+                             (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?",
+                       (time.time(), key))
+            db.commit()
+            return row[0]
+
+    def put(self, prompt, model, max_tokens, response):
+        """Store a response (replacing any previous one) and evict if needed."""
+        key = cache_key(prompt, model, max_tokens)
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now)
+            )
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db):
+        count, total = db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk from least recently used, dropping rows until both limits hold
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self):
+        """Return (entries, total response bytes)."""
+        with self._lock:
+            return tuple(self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone())
+
+    def clear(self):
+        """Delete every cached response."""
+        with self._lock:
+            db = self._connect()
+            db.execute("DELETE FROM responses")
+            db.commit()
+            db.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_cache = None
+
+
+def get_cache(config):
+    """
+    Return the shared cache sized from the add-on config, or None if
+    caching is turned off.
+    """
+    global _cache
+    if not config.get("cache_responses", True):
+        return None
+    max_entries = config.get("cache_max_entries", DEFAULT_MAX_ENTRIES)
+    max_bytes = config.get("cache_max_mb", DEFAULT_MAX_MB) * 1024 * 1024
+    if _cache is None:
+        _cache = ResponseCache(max_entries=max_entries, max_bytes=max_bytes)
+    else:
+        _cache.max_entries = max_entries
+        _cache.max_bytes = max_bytes
+    return _cache
@@ -7,7 +7,11 @@ from aqt.qt import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
                      QMessageBox, Qt)
 from aqt.utils import showInfo, tooltip
 from aqt import mw
+from . import on_config_updated
 from .api_client import test_api_key
+from .response_cache import get_cache
+from .prefetch import PREFETCH_ACTIONS
+from .usage import get_ledger
 
 
 class SettingsDialog(QDialog):
@@ -102,6 +106,17 @@ class SettingsDialog(QDialog):
         tokens_layout.addStretch()
         model_layout.addLayout(tokens_layout)
 
+        # Batch concurrency
+        concurrency_layout = QHBoxLayout()
+        concurrency_layout.addWidget(QLabel("Batch Parallel Requests:"))
+        self.batch_concurrency_spin = QSpinBox()
+        self.batch_concurrency_spin.setRange(1, 16)
+        self.batch_concurrency_spin.setValue(4)
+        concurrency_layout.addWidget(self.batch_concurrency_spin)
+        concurrency_layout.addWidget(QLabel("(Used by Browser → Notes → AI Batch Assistant)"))
+        concurrency_layout.addStretch()
+        model_layout.addLayout(concurrency_layout)
+
         model_group.setLayout(model_layout)
         layout.addWidget(model_group)
 
@@ -117,9 +132,49 @@ class SettingsDialog(QDialog):
         self.auto_tag_checkbox.setChecked(True)
         options_layout.addWidget(self.auto_tag_checkbox)
 
+        cache_layout = QHBoxLayout()
+        self.cache_checkbox = QCheckBox("Cache responses (repeat questions are instant and free)")
+        self.cache_checkbox.setChecked(True)
+        cache_layout.addWidget(self.cache_checkbox)
+        cache_layout.addStretch()
+        self.clear_cache_btn = QPushButton("Clear Cache")
+        self.clear_cache_btn.clicked.connect(self.clear_cache)
+        cache_layout.addWidget(self.clear_cache_btn)
+        options_layout.addLayout(cache_layout)
+
+        self.precheck_checkbox = QCheckBox("Count prompt tokens exactly before sending (one extra, free request)")
+        self.precheck_checkbox.setChecked(False)
+        options_layout.addWidget(self.precheck_checkbox)
+
         options_group.setLayout(options_layout)
         layout.addWidget(options_group)
 
+        # Prefetch
+        prefetch_group = QGroupBox("Prefetch During Review")
+        prefetch_layout = QVBoxLayout()
+
+        self.prefetch_checkbox = QCheckBox("Prepare answers for upcoming cards in the background")
+        prefetch_layout.addWidget(self.prefetch_checkbox)
+
+        prefetch_action_layout = QHBoxLayout()
+        prefetch_action_layout.addWidget(QLabel("Action:"))
+        self.prefetch_action_combo = QComboBox()
+        self.prefetch_action_combo.addItems(PREFETCH_ACTIONS)
+        prefetch_action_layout.addWidget(self.prefetch_action_combo)
+        prefetch_action_layout.addWidget(QLabel("Cards ahead:"))
+        self.prefetch_cards_spin = QSpinBox()
+        self.prefetch_cards_spin.setRange(1, 10)
+        prefetch_action_layout.addWidget(self.prefetch_cards_spin)
+        prefetch_action_layout.addWidget(QLabel("Max per day:"))
+        self.prefetch_limit_spin = QSpinBox()
+        self.prefetch_limit_spin.setRange(1, 1000)
+        prefetch_action_layout.addWidget(self.prefetch_limit_spin)
+        prefetch_action_layout.addStretch()
+        prefetch_layout.addLayout(prefetch_action_layout)
+
+        prefetch_group.setLayout(prefetch_layout)
+        layout.addWidget(prefetch_group)
+
         # Cost Information
         cost_group = QGroupBox("💰 Cost Information")
         cost_layout = QVBoxLayout()
@@ -139,6 +194,25 @@ class SettingsDialog(QDialog):
         cost_group.setLayout(cost_layout)
         layout.addWidget(cost_group)
 
+        # Usage recorded from API responses
+        usage_group = QGroupBox("📊 Your Usage")
+        usage_layout = QVBoxLayout()
+
+        self.usage_label = QLabel()
+        self.usage_label.setWordWrap(True)
+        self.usage_label.setStyleSheet("padding: 10px; background: #f9f9f9; border-radius: 4px;")
+        usage_layout.addWidget(self.usage_label)
+
+        reset_usage_layout = QHBoxLayout()
+        reset_usage_layout.addStretch()
+        reset_usage_btn = QPushButton("Reset Usage")
+        reset_usage_btn.clicked.connect(self.reset_usage)
+        reset_usage_layout.addWidget(reset_usage_btn)
+        usage_layout.addLayout(reset_usage_layout)
+
+        usage_group.setLayout(usage_layout)
+        layout.addWidget(usage_group)
+
         # Buttons
         button_layout = QHBoxLayout()
         button_layout.addStretch()
@@ -170,8 +244,46 @@ class SettingsDialog(QDialog):
         self.api_key_input.setText(self.config.get("api_key", ""))
         self.model_combo.setCurrentText(self.config.get("model", "claude-sonnet-4-20250514"))
         self.max_tokens_spin.setValue(self.config.get("max_tokens", 1024))
+        self.batch_concurrency_spin.setValue(self.config.get("batch_concurrency", 4))
         self.show_cost_checkbox.setChecked(self.config.get("show_cost_estimate", True))
         self.auto_tag_checkbox.setChecked(self.config.get("auto_tag_ai_cards", True))
+        self.cache_checkbox.setChecked(self.config.get("cache_responses", True))
+        self.precheck_checkbox.setChecked(self.config.get("precheck_token_count", False))
+        self.prefetch_checkbox.setChecked(self.config.get("prefetch_enabled", False))
+        self.prefetch_action_combo.setCurrentText(
+            self.config.get("prefetch_action", "Simplify the explanation"))
+        self.prefetch_cards_spin.setValue(self.config.get("prefetch_cards", 3))
+        self.prefetch_limit_spin.setValue(self.config.get("prefetch_daily_limit", 50))
+        self.show_usage()
+
+    def show_usage(self):
+        """Show today's and the last 30 days' usage, by deck and model."""
+        ledger = get_ledger()
+        _, requests, input_tokens, output_tokens, cost = ledger.totals(days=1)[0]
+        lines = [f"<b>Today:</b> {requests} requests, {input_tokens:,} in / "
+                 f"{output_tokens:,} out tokens, ${cost:.4f}"]
+        _, requests, input_tokens, output_tokens, cost = ledger.totals(days=30)[0]
+        lines.append(f"<b>Last 30 days:</b> {requests} requests, {input_tokens:,} in / "
+                     f"{output_tokens:,} out tokens, ${cost:.4f}")
+        for group_by, title in (("deck", "By deck"), ("model", "By model")):
+            rows = ledger.totals(days=30, group_by=group_by)[:5]
+            if rows:
+                lines.append(f"<br><b>{title} (30 days):</b>")
+                lines.extend(f"• {name or '(none)'}: {requests} requests, ${cost:.4f}"
+                             for name, requests, _, _, cost in rows)
+        self.usage_label.setText("<br>".join(lines))
+
+    def reset_usage(self):
+        """Clear the usage ledger."""
+        reply = QMessageBox.question(
+            self,
+            "Reset Usage",
+            "Forget all recorded usage?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            get_ledger().clear()
+            self.show_usage()
 
     def toggle_key_visibility(self, checked):
         """Toggle API key visibility."""
@@ -180,6 +292,13 @@ class SettingsDialog(QDialog):
         else:
             self.api_key_input.setEchoMode(QLineEdit.Password)
 
+    def clear_cache(self):
+        """Delete all cached responses."""
+        cache = get_cache(dict(self.config, cache_responses=True))
+        entries, size = cache.stats()
+        cache.clear()
+        tooltip(f"Cleared {entries} cached responses ({size / 1024:.0f} KB)", 2000)
+
     def test_api_key(self):
         """Test the API key."""
         api_key = self.api_key_input.text().strip()
@@ -190,9 +309,24 @@ class SettingsDialog(QDialog):
 
         self.test_btn.setEnabled(False)
         self.test_btn.setText("Testing...")
+        model = self.model_combo.currentText()
 
-        try:
-            success, message = test_api_key(api_key, self.model_combo.currentText())
+        # In the background: rate limit waits and retries can take minutes
+        def task():
+            return test_api_key(api_key, model)
+
+        def on_done(future):
+            self.test_btn.setEnabled(True)
+            self.test_btn.setText("Test API Key")
+            try:
+                success, message = future.result()
+            except Exception as e:
+                QMessageBox.critical(
+                    self,
+                    "Error",
+                    f"Error testing API key:\n\n{str(e)}"
+                )
+                return
 
             if success:
                 QMessageBox.information(
@@ -208,16 +342,7 @@ class SettingsDialog(QDialog):
                     "Please check your API key and try again."
                 )
 
-        except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"Error testing API key:\n\n{str(e)}"
-            )
-
-        finally:
-            self.test_btn.setEnabled(True)
-            self.test_btn.setText("Test API Key")
+        mw.taskman.run_in_background(task, on_done)
 
     def save_settings(self):
         """Save settings."""
@@ -239,11 +364,19 @@ class SettingsDialog(QDialog):
         self.config["api_provider"] = "anthropic"
         self.config["model"] = self.model_combo.currentText()
         self.config["max_tokens"] = self.max_tokens_spin.value()
+        self.config["batch_concurrency"] = self.batch_concurrency_spin.value()
         self.config["show_cost_estimate"] = self.show_cost_checkbox.isChecked()
         self.config["auto_tag_ai_cards"] = self.auto_tag_checkbox.isChecked()
+        self.config["cache_responses"] = self.cache_checkbox.isChecked()
+        self.config["precheck_token_count"] = self.precheck_checkbox.isChecked()
+        self.config["prefetch_enabled"] = self.prefetch_checkbox.isChecked()
+        self.config["prefetch_action"] = self.prefetch_action_combo.currentText()
+        self.config["prefetch_cards"] = self.prefetch_cards_spin.value()
+        self.config["prefetch_daily_limit"] = self.prefetch_limit_spin.value()
 
         # Save to disk
         mw.addonManager.writeConfig(__name__, self.config)
+        on_config_updated(dict(self.config))
 
         tooltip("Settings saved!", 2000)
         self.accept()
@@ -0,0 +1,145 @@
+"""
+Token usage and cost ledger, recorded from the usage reported by each response
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from .response_cache import USER_FILES
+
+LEDGER_FILE = os.path.join(USER_FILES, "usage.sqlite3")
+
+# USD per million tokens: (input, output)
+PRICES = {
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "claude-3-opus-20240229": (15.00, 75.00),
+}
+DEFAULT_PRICE = (3.00, 15.00)
+
+# Prompt caching: writes cost 1.25x and reads 0.1x the input price
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+
+# Message Batches are billed at half price
+BATCH_DISCOUNT = 0.5
+
+
+def cost(model, usage, batch=False):
+    """Cost in USD of one response's usage (see api_client.USAGE_FIELDS)."""
+    input_price, output_price = PRICES.get(model, DEFAULT_PRICE)
+    input_cost = (usage.get("input_tokens", 0)
+                  + usage.get("cache_creation_input_tokens", 0) * CACHE_WRITE_MULTIPLIER
+                  + usage.get("cache_read_input_tokens", 0) * CACHE_READ_MULTIPLIER)
+    total = (input_cost * input_price + usage.get("output_tokens", 0) * output_price) / 1e6
+    return total * BATCH_DISCOUNT if batch else total
+
+
+def estimate_cost(model, input_tokens, max_tokens):
+    """Upper bound on the cost of a request: its input plus max_tokens of output."""
+    return cost(model, {"input_tokens": input_tokens, "output_tokens": max_tokens})
+
+
+class UsageLedger:
+    """
+    Running per-day, per-deck, per-model totals in SQLite.
+
+    Safe to record from worker threads.
+    """
+
+    def __init__(self, path=LEDGER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                " day TEXT NOT NULL,"
+                " deck TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " requests INTEGER NOT NULL,"
+                " input_tokens INTEGER NOT NULL,"
+                " output_tokens INTEGER NOT NULL,"
+                " cache_creation_tokens INTEGER NOT NULL,"
+                " cache_read_tokens INTEGER NOT NULL,"
+                " cost REAL NOT NULL,"
+                " PRIMARY KEY (day, deck, model))"
+            )
+            self._db.commit()
+        return self._db
+
+    def record(self, model, deck, usage, day=None, batch=False):
+        """Add one response's usage; returns its cost in USD."""
+        amount = cost(model, usage, batch)
+        row = (
+            (day or date.today()).isoformat(), deck or "", model,
+            usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+            usage.get("cache_creation_input_tokens", 0),
+            usage.get("cache_read_input_tokens", 0), amount,
+        )
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT INTO usage VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (day, deck, model) DO UPDATE SET"
+                " requests = requests + 1,"
+                " input_tokens = input_tokens + excluded.input_tokens,"
+                " output_tokens = output_tokens + excluded.output_tokens,"
+                " cache_creation_tokens = cache_creation_tokens + excluded.cache_creation_tokens,"
+                " cache_read_tokens = cache_read_tokens + excluded.cache_read_tokens,"
+                " cost = cost + excluded.cost",
+                row
+            )
+            db.commit()
+        return amount
+
+    def totals(self, days=1, group_by=None):
+        """
+        Totals over the last `days` days (1 = today).
+
+        Args:
+            group_by: None, "day", "deck" or "model"
+
+        Returns:
+            list of (group, requests, input_tokens, output_tokens, cost),
+            most expensive first; group is None when not grouping
+        """
+        if group_by not in (None, "day", "deck", "model"):
+            raise ValueError(f"Can't group usage by {group_by!r}")
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        group = group_by or "NULL"
+        query = (
+            f"SELECT {group}, SUM(requests), SUM(input_tokens + cache_creation_tokens"
+            f" + cache_read_tokens), SUM(output_tokens), SUM(cost)"
+            f" FROM usage WHERE day >= ?"
+        )
+        if group_by:
+            query += f" GROUP BY {group_by} ORDER BY SUM(cost) DESC"
+        with self._lock:
+            rows = self._connect().execute(query, (since,)).fetchall()
+        return [(row[0], row[1] or 0, row[2] or 0, row[3] or 0, row[4] or 0.0)
+                for row in rows]
+
+    def clear(self):
+        """Forget all recorded usage."""
+        with self._lock:
+            db = self._connect()
+            db.execute("DELETE FROM usage")
+            db.commit()
+
+
+_ledger = None
+
+
+def get_ledger():
+    """Return the shared usage ledger."""
+    global _ledger
+    if _ledger is None:
+        _ledger = UsageLedger()
+    return _ledger
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark what the AI Card Assistant add-on adds to Anki's startup.
+
+Usage:
+    python3 benchmark-addon-startup.py               # 20 runs
+    python3 benchmark-addon-startup.py --runs 50
+    python3 benchmark-addon-startup.py --output startup.json
+
+Anki itself isn't needed: aqt and anki are replaced by minimal stand-in
+modules, imported before timing starts (Anki has them loaded by the time
+add-ons load). Each run is a fresh interpreter, timing:
+
+    startup    - importing the add-on package, which runs init()
+    first_use  - importing the dialog, settings, batch and prefetch
+                 modules, as happens the first time each is opened
+
+Results are printed as JSON: median/min/max milliseconds per phase, plus
+the add-on and notable standard library modules each phase loaded.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'anki-ai-assistant')
+PACKAGE = 'ai_card_assistant'
+FIRST_USE = ['ai_assistant', 'settings', 'batch', 'prefetch']
+
+# Standard library modules that would show the API client or caches loading
+NOTABLE_MODULES = ['http.client', 'ssl', 'sqlite3', 'concurrent.futures', 'json']
+
+STUB_MODULES = {
+    'aqt/__init__.py': '''
+class _Stub:
+    def __init__(self, *args, **kwargs): pass
+    def __getattr__(self, name): return _Stub()
+    def __call__(self, *args, **kwargs): return _Stub()
+    def __iter__(self): return iter(())
+    def __or__(self, other): return self
+
+mw = _Stub()
+gui_hooks = _Stub()
+''',
+    'aqt/qt.py': 'from . import _Stub\ndef __getattr__(name): return _Stub\n',
+    'aqt/utils.py': 'from . import _Stub\ndef __getattr__(name): return _Stub()\n',
+    'aqt/operations.py': 'from . import _Stub\ndef __getattr__(name): return _Stub\n',
+    'anki/__init__.py': '',
+    'anki/errors.py': 'class NotFoundError(Exception): pass\n',
+    'anki/collection.py': 'class AddNoteRequest:\n    def __init__(self, note, deck_id): pass\n',
+}
+
+CHILD = '''
+import importlib, importlib.util, json, sys, time
+import aqt, aqt.qt, aqt.utils, aqt.operations, anki.errors, anki.collection
+
+ADDON_DIR, PACKAGE, FIRST_USE, NOTABLE = json.loads(sys.argv[1])
+
+def phase(load):
+    before = set(sys.modules)
+    start = time.perf_counter()
+    load()
+    seconds = time.perf_counter() - start
+    loaded = set(sys.modules) - before
+    return {
+        "seconds": seconds,
+        "addon_modules": sorted(m[len(PACKAGE) + 1:] for m in loaded if m.startswith(PACKAGE + ".")),
+        "notable_modules": sorted(m for m in NOTABLE if m in loaded),
+    }
+
+def load_package():
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE, ADDON_DIR + "/__init__.py", submodule_search_locations=[ADDON_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = module
+    spec.loader.exec_module(module)
+
+def load_first_use():
+    for name in FIRST_USE:
+        importlib.import_module(PACKAGE + "." + name)
+
+print(json.dumps({"startup": phase(load_package), "first_use": phase(load_first_use)}))
+'''
+
+
+def write_stubs(directory):
+    for path, source in STUB_MODULES.items():
+        full_path = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w', encoding='utf-8') as f:
+            f.write(source)
+
+
+def run_once(stub_dir):
+    """Time one fresh interpreter; bytecode is cached after the first run"""
+    env = dict(os.environ, PYTHONPATH=stub_dir)
+    args = json.dumps([ADDON_DIR, PACKAGE, FIRST_USE, NOTABLE_MODULES])
+    result = subprocess.run([sys.executable, '-c', CHILD, args], env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def summarize(runs, name):
+    millis = [run[name]['seconds'] * 1000 for run in runs]
+    return {
+        'median_ms': round(statistics.median(millis), 3),
+        'min_ms': round(min(millis), 3),
+        'max_ms': round(max(millis), 3),
+        'addon_modules': runs[-1][name]['addon_modules'],
+        'notable_modules': runs[-1][name]['notable_modules'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the AI Card Assistant add-on startup cost')
+    parser.add_argument('--runs', type=int, default=20, help='fresh interpreters to time (default: 20)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='anki-addon-bench-') as stub_dir:
+        write_stubs(stub_dir)
+        run_once(stub_dir)   # warm up: compile bytecode
+        runs = [run_once(stub_dir) for _ in range(args.runs)]
+
+    report = {
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'runs': args.runs,
+        'startup': summarize(runs, 'startup'),
+        'first_use': summarize(runs, 'first_use'),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
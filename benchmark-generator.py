@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Anki package generator on synthetic flashcard decks.
+
+Usage:
+    python3 benchmark-generator.py                       # 1k/10k/100k cards
+    python3 benchmark-generator.py --sizes 1000 10000    # pick sizes
+    python3 benchmark-generator.py --output bench.json
+
+Every combination of size, card format (front/back/tags divs or
+Question/Answer headings) and cloze mix is generated as an HTML file and
+run through generate-anki-packages.py in a fresh process, so memory
+figures are per case. Each phase is timed separately:
+
+    parse     - extract_cards_from_html
+    dedup     - MinHash signatures and the LSH near-duplicate search
+    notes     - genanki.Note construction (make_note + Deck.add_note)
+    package   - writing the single-deck .apkg (as run_deck_job does)
+    combined  - create_combined_package with the cards split over 10 decks
+
+Results are printed as JSON: seconds and cards/sec per phase, and the
+process's peak RSS so far (cumulative_peak_rss_kb) with how much the phase
+raised it (peak_rss_growth_kb). Phases share their data, so growth is 0
+for a phase that fit in memory an earlier phase had already used.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import warnings
+
+GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate-anki-packages.py')
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+FORMATS = ['divs', 'qa']
+CLOZE_EVERY = 5          # with cloze enabled, every 5th card is a cloze card
+COMBINED_DECKS = 10
+
+HTML_HEAD = '''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Synthetic Flashcards</title>
+</head>
+<body>
+'''
+
+HTML_TAIL = '''
+</body>
+</html>
+'''
+
+
+def load_generator():
+    """Import generate-anki-packages.py (its file name isn't importable as-is)"""
+    spec = importlib.util.spec_from_file_location('generate_anki_packages', GENERATOR)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def divs_card(i, cloze):
+    if cloze:
+        front = (f'Command {i}: {{{{c1::grep -rn pattern{i}}}}} searches recursively and '
+                 f'{{{{c2::prints line numbers}}}}.')
+        back = ''
+        tags = 'cs bench cloze'
+    else:
+        front = f'How do you search for <code>pattern{i}</code> recursively with line numbers?'
+        back = f'''<strong>Command:</strong> <code>grep -rn pattern{i} .</code>
+
+        <p><strong>Why:</strong> <code>-r</code> recurses into directories and <code>-n</code>
+        prints line numbers &amp; file names.</p>
+
+        <div class="note">Card {i}: combine with <code>--include='*.py'</code> to filter files.</div>
+
+        <ul>
+            <li><code>grep -rl pattern{i}</code> - only list matching files</li>
+            <li><code>rg pattern{i}</code> - faster alternative</li>
+        </ul>'''
+        tags = 'cs bench EN'
+    return f'''
+<!-- Card {i} -->
+<div class="card">
+    <div class="front">
+        {front}
+    </div>
+    <div class="back">
+        {back}
+    </div>
+    <div class="tags">{tags}</div>
+</div>
+'''
+
+
+def qa_card(i, cloze):
+    if cloze:
+        return f'''
+<!-- Card {i}: Synthetic (CLOZE) -->
+<div class="card">
+    <h3>CS Vocab::bench</h3>
+    <h4>Question:</h4>
+    <p>LoRA layer {i} uses {{{{c1::rank-r matrices}}}} scaled by {{{{c2::alpha/r}}}}.</p>
+    <h4>Answer:</h4>
+    <p>See cloze deletions above.</p>
+</div>
+'''
+    return f'''
+<!-- Card {i}: Synthetic -->
+<div class="card">
+    <h3>CS Vocab::bench</h3>
+    <h4>Question:</h4>
+    <p>Implement function number {i} in PyTorch. Why does it use log_softmax?</p>
+    <h4>Answer:</h4>
+    <p><strong>Implementation:</strong></p>
+    <pre>import torch
+import torch.nn.functional as F
+
+def loss_{i}(logits, targets):
+    log_probs = F.log_softmax(logits, dim=-1)
+    return F.nll_loss(log_probs, targets)</pre>
+    <p><strong>Why:</strong> numerical stability &mdash; avoids log(0) for x &lt; -100.</p>
+</div>
+'''
+
+
+def write_synthetic_html(path, n_cards, fmt, cloze):
+    """Write an n_cards deck in the given format, streaming it to disk"""
+    make_card = divs_card if fmt == 'divs' else qa_card
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(HTML_HEAD)
+        for i in range(1, n_cards + 1):
+            f.write(make_card(i, cloze and i % CLOZE_EVERY == 0))
+        f.write(HTML_TAIL)
+
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_case(case):
+    """Benchmark one (size, format, cloze) case; runs in its own process"""
+    n_cards, fmt, cloze, workdir = case
+    warnings.simplefilter('ignore')   # genanki warns about '<' in code samples
+    gen = load_generator()
+
+    html_file = os.path.join(workdir, f'bench-{fmt}-{n_cards}-{int(cloze)}-flashcards.html')
+    write_synthetic_html(html_file, n_cards, fmt, cloze)
+    html_bytes = os.path.getsize(html_file)
+
+    phases = {}
+    last_peak = peak_rss_kb()
+
+    def record(name, seconds, count):
+        nonlocal last_peak
+        peak = peak_rss_kb()
+        phases[name] = {
+            'seconds': round(seconds, 4),
+            'cards_per_sec': round(count / seconds, 1) if seconds else None,
+            'cumulative_peak_rss_kb': peak,
+            'peak_rss_growth_kb': peak - last_peak,
+        }
+        last_peak = peak
+
+    start = time.perf_counter()
+    cards = gen.extract_cards_from_html(html_file)
+    record('parse', time.perf_counter() - start, len(cards))
+
+    start = time.perf_counter()
+    signatures = [gen.card_signature(card_data) for card_data in cards]
+    gen.find_near_duplicates([signatures])
+    record('dedup', time.perf_counter() - start, len(cards))
+
+    start = time.perf_counter()
+    deck = gen.genanki.Deck(2059499999, 'CS Vocab::Benchmark')
+    for card_data in cards:
+        deck.add_note(gen.make_note(card_data))
+    record('notes', time.perf_counter() - start, len(cards))
+
+    start = time.perf_counter()
+    gen.genanki.Package(deck).write_to_file(os.path.join(workdir, 'bench-deck.apkg'))
+    record('package', time.perf_counter() - start, len(cards))
+
+    decks = []
+    per_deck = -(-len(deck.notes) // COMBINED_DECKS)
+    for n in range(COMBINED_DECKS):
+        sub = gen.genanki.Deck(2059499900 + n, f'CS Vocab::Benchmark::Part {n + 1}')
+        for note in deck.notes[n * per_deck:(n + 1) * per_deck]:
+            sub.add_note(note)
+        decks.append(sub)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        gen.create_combined_package(decks, os.path.join(workdir, 'bench-all.apkg'))
+    record('combined', time.perf_counter() - start, len(cards))
+
+    for path in (html_file, os.path.join(workdir, 'bench-deck.apkg'),
+                 os.path.join(workdir, 'bench-all.apkg')):
+        os.remove(path)
+
+    return {
+        'cards': len(cards),
+        'requested_cards': n_cards,
+        'format': fmt,
+        'cloze': cloze,
+        'html_bytes': html_bytes,
+        'phases': phases,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the CS Vocab Anki package generator')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, metavar='N',
+                        help='deck sizes in cards (default: 1000 10000 100000)')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS,
+                        help='card formats to generate (default: both)')
+    parser.add_argument('--cloze', choices=['with', 'without', 'both'], default='both',
+                        help='include cloze cards (default: both variants)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    cloze_variants = {'with': [True], 'without': [False], 'both': [False, True]}[args.cloze]
+
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='anki-bench-') as workdir:
+        for n_cards in args.sizes:
+            for fmt in args.formats:
+                for cloze in cloze_variants:
+                    case = (n_cards, fmt, cloze, workdir)
+                    print(f'... {n_cards} cards, {fmt}, cloze={cloze}', file=sys.stderr)
+                    # One process per case so peak RSS isn't inherited across cases
+                    with ctx.Pool(1) as pool:
+                        results.append(pool.apply(run_case, (case,)))
+
+    report = {
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
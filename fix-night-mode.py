@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 """
 Fix CSS in all flashcard HTML files to work in both light and night modes
+
+Usage:
+    python3 fix-night-mode.py                 # every *-flashcards.html
+    python3 fix-night-mode.py --dry-run       # report what would change
+    python3 fix-night-mode.py git-flashcards.html
+
+Files whose <style> block already matches NIGHT_MODE_CSS are left alone.
 """
 
 import re
-import glob
+
+from html_transforms import main as run_transform_script
 
 # New CSS that works in both modes
 NIGHT_MODE_CSS = '''    <style>
@@ -91,45 +99,23 @@ NIGHT_MODE_CSS = '''    <style>
         }
     </style>'''
 
-def fix_html_file(filepath):
-    """Fix CSS in a single HTML file"""
-    print(f"Fixing {filepath}...")
-
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Replace the entire <style> section
-    # Find style tag and replace everything between <style> and </style>
-    pattern = r'<style>.*?</style>'
-
-    # Replace with new CSS
-    new_content = re.sub(pattern, NIGHT_MODE_CSS, content, flags=re.DOTALL)
-
-    # Write back
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(new_content)
-
-    print(f"  ✓ Fixed {filepath}")
+STYLE_BLOCK = re.compile(r'<style>.*?</style>', re.DOTALL)
 
-def main():
-    # Find all flashcard HTML files
-    html_files = glob.glob('*-flashcards.html')
 
-    if not html_files:
-        print("No flashcard HTML files found!")
-        return
+def fix_night_mode(content):
+    """Replace the <style> section with NIGHT_MODE_CSS"""
+    # The match starts at <style>, after the line's indentation, so the
+    # replacement mustn't add another copy of it
+    return STYLE_BLOCK.sub(lambda match: NIGHT_MODE_CSS.lstrip(), content)
 
-    print(f"Found {len(html_files)} flashcard files")
-    print()
 
-    for filepath in html_files:
-        fix_html_file(filepath)
+def main(argv=None):
+    written = run_transform_script(
+        fix_night_mode, 'Fix flashcard CSS for light and night modes', argv)
+    if written:
+        print("Now regenerate the Anki packages:")
+        print("  python3 generate-anki-packages.py")
 
-    print()
-    print("=" * 50)
-    print("All files fixed!")
-    print("Now regenerate the Anki packages:")
-    print("  python3 generate-anki-packages.py")
 
 if __name__ == '__main__':
     main()
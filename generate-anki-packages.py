@@ -4,17 +4,83 @@ Generate Anki package files (.apkg) for CS Vocab flashcards.
 
 Usage:
     pip install genanki
-    python3 generate-anki-packages.py
+    python3 generate-anki-packages.py           # rebuild only changed decks
+    python3 generate-anki-packages.py --force   # rebuild everything
+    python3 generate-anki-packages.py -j 0      # build decks on every CPU core
+    python3 generate-anki-packages.py --combined-only   # just cs-vocab-all.apkg
+    python3 generate-anki-packages.py --only git ssh    # selected decks
+    python3 generate-anki-packages.py --tag ml          # decks tagged "ml"
+    python3 generate-anki-packages.py --txt             # also write *-anki-import.txt
+    python3 generate-anki-packages.py --delta           # also write cs-vocab-delta.apkg
+    python3 generate-anki-packages.py --duplicates report   # list near-duplicate cards
+    python3 generate-anki-packages.py --duplicates drop     # ...and leave them out
+    python3 generate-anki-packages.py --watch   # rebuild decks as they're saved
+    python3 search-cards.py "rebase onto"       # query the card index
+
+Decks are listed in deck-registry.json; new *-flashcards.html files are
+discovered automatically and get a deck ID derived from their name.
+
+Only decks whose HTML (or the card model CSS/templates) changed since the
+last run are rebuilt; the digests live in anki-build-manifest.json, which
+is committed along with the packages so a fresh checkout (or CI) only
+rebuilds what changed.
+Parsed cards are cached per HTML file in .anki-card-cache/.
+
+Note GUIDs are kept in note-guids.json (commit it), so editing a card
+updates the existing note on import instead of adding a new one. Give a
+card an id (<div class="card" id="...">) to keep its identity through
+any edit. --delta packages just the notes added or changed since the
+previous build, for a quick re-import.
+
+--duplicates compares every card against all decks with MinHash/LSH
+(near-linear, so it stays fast on large corpora) and lists pairs whose
+text is at least --duplicate-threshold similar; "drop" keeps only the
+first card of each, in registry order.
+
+Every card's plain text is also indexed in card-index.sqlite3 (SQLite
+FTS5, updated for changed decks only; --no-index skips it), which
+search-cards.py queries.
+
+--watch keeps every deck parsed in memory after the build and watches the
+HTML files (inotify on Linux, polling elsewhere): saving a deck rebuilds
+just its package and the combined one, typically in well under a second.
+New decks are picked up on the next start.
 
 Outputs:
     - cs-vocab-git.apkg
     - cs-vocab-tmux.apkg
     - cs-vocab-ssh.apkg
     - cs-vocab-all.apkg (combined package)
+    - cs-vocab-delta.apkg (with --delta)
+    - card-index.sqlite3 (search index)
 """
 
+import argparse
+import csv
+import ctypes
+import ctypes.util
+import glob
+import hashlib
+import html
+import json
+import os
 import re
-import random
+import select
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+# HTML-to-text conversion is shared with the Anki add-on
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'anki-ai-assistant'))
+from html_text import html_to_text
 
 try:
     import genanki
@@ -25,70 +91,456 @@ except ImportError:
     exit(1)
 
 
-def extract_cards_from_html(filename):
-    """Extract cards from HTML file and return as list of dicts"""
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
+# Tokens the card parser cares about: comments (skipped whole, so markup
+# inside them is ignored) and the only tags that carry card structure.
+# Everything else is never tokenized; fields are sliced verbatim out of
+# the source.
+_TOKEN = re.compile(r'<!--.*?-->|<(/?)(div|p|h4)\b([^>]*)>', re.DOTALL | re.IGNORECASE)
+_CLASS_ATTR = re.compile(r'''\bclass\s*=\s*["']([^"']*)["']''', re.IGNORECASE)
+_ID_ATTR = re.compile(r'''(?<![-\w])id\s*=\s*["']([^"']*)["']''', re.IGNORECASE)
+
+
+class CardParser:
+    """
+    Single-pass streaming parser for flashcard HTML.
+
+    Handles both card formats:
+      - <div class="front">/<div class="back">/<div class="tags"> divs
+      - <h3>deck</h3> <h4>Question:</h4><p>...</p> <h4>Answer:</h4>...
+
+    feed() accepts the file in arbitrary chunks. Finished cards are appended
+    to self.cards as soon as their <div class="card"> closes, and only the
+    text of the card currently open is kept in memory.
+
+    A card div's id attribute (<div class="card" id="rebase-onto">) is
+    kept as the card's 'key', its stable identity across edits.
+    """
 
-    # Try new format first (ML flashcards)
-    # Pattern matches: <div class="card">...</div> with proper nesting
-    card_pattern = r'<div class="card">\s*<h3>(.*?)</h3>(.*?)(?=<div class="card">|</body>)'
-    matches = re.findall(card_pattern, content, re.DOTALL)
+    FIELD_CLASSES = ('front', 'back', 'tags')
 
-    extracted = []
+    def __init__(self):
+        self.cards = []
+        self._buf = ''
+        self._base = 0       # absolute offset of self._buf[0]
+        self._pos = 0        # absolute offset of the next text to tokenize
+        self._card = None    # state of the open card (absolute offsets)
 
-    if matches:
-        # New format: Question/Answer with h4 tags
-        for deck_name, card_content in matches:
+    def feed(self, data):
+        self._buf += data
+        self._scan(final=False)
+
+    def close(self):
+        self._scan(final=True)
+        self._card = None
+
+    def _text(self, start, end):
+        return self._buf[start - self._base:end - self._base]
+
+    def _scan(self, final):
+        buf = self._buf
+        pos = self._pos - self._base
+        limit = len(buf)
+        if not final:
+            # Hold back a comment or tag that may continue in the next chunk
+            comment = buf.rfind('<!--', pos)
+            if comment != -1 and buf.find('-->', comment + 4) == -1:
+                limit = comment
+            lt = buf.rfind('<', pos, limit)
+            if lt != -1 and buf.find('>', lt, limit) == -1:
+                limit = lt
+
+        for match in _TOKEN.finditer(buf, pos, limit):
+            closing, tag, attrs = match.groups()
+            if tag is None:
+                continue
+            tag = tag.lower()
+            start, end = match.start() + self._base, match.end() + self._base
+            if closing:
+                self._end_tag(tag, start, end)
+            else:
+                self._start_tag(tag, attrs, end)
+        self._pos = limit + self._base
+
+        # Drop text that no open card can refer to any more
+        keep = self._card['start'] if self._card else self._pos
+        if keep > self._base:
+            self._buf = self._buf[keep - self._base:]
+            self._base = keep
+
+    @staticmethod
+    def _classes(attrs):
+        match = _CLASS_ATTR.search(attrs)
+        return match.group(1).split() if match else []
+
+    def _start_tag(self, tag, attrs, end):
+        card = self._card
+        if card is None:
+            if tag == 'div' and 'card' in self._classes(attrs):
+                key = _ID_ATTR.search(attrs)
+                self._card = {'start': end, 'depth': 0, 'open': None,
+                              'label': None, 'want_question': False, 'fields': {},
+                              'key': key.group(1).strip() if key else None}
+            return
+
+        if tag == 'div':
+            card['depth'] += 1
+            if card['depth'] == 1 and card['open'] is None:
+                classes = self._classes(attrs)
+                for name in self.FIELD_CLASSES:
+                    if name in classes:
+                        card['open'] = (name, end)
+                        break
+        elif card['open'] is None:
+            if tag == 'h4':
+                card['label'] = end
+            elif tag == 'p' and card['want_question']:
+                card['want_question'] = False
+                card['open'] = ('question', end)
+
+    def _end_tag(self, tag, start, end):
+        card = self._card
+        if card is None:
+            return
+
+        if tag == 'div':
+            if card['depth'] == 0:
+                self._finish_card(start)
+                return
+            if card['depth'] == 1 and card['open'] and card['open'][0] != 'question':
+                self._close_field(start)
+            card['depth'] -= 1
+        elif tag == 'p' and card['open'] and card['open'][0] == 'question':
+            self._close_field(start)
+        elif tag == 'h4' and card['label'] is not None:
+            label = self._text(card['label'], start).strip()
+            card['label'] = None
+            if label == 'Question:' and 'question' not in card['fields']:
+                card['want_question'] = True
+            elif label == 'Answer:' and 'answer' not in card:
+                # The answer runs to the end of the card
+                card['answer'] = end
+
+    def _close_field(self, end):
+        name, start = self._card['open']
+        self._card['open'] = None
+        self._card['fields'].setdefault(name, self._text(start, end).strip())
+
+    def _finish_card(self, end):
+        card = self._card
+        self._card = None
+        fields = card['fields']
+
+        if 'question' in fields:
             # Check if it's a cloze card (has {{c1::...}})
-            if '{{c' in card_content:
+            if '{{c' in self._text(card['start'], end):
                 # Cloze card: Question becomes both front and back
-                question_match = re.search(r'<h4>Question:</h4>\s*<p>(.*?)</p>', card_content, re.DOTALL)
-                if question_match:
-                    question = question_match.group(1).strip()
-                    extracted.append({
-                        'front': question,
-                        'back': question,
-                        'tags': ['cloze']
-                    })
+                parsed = {
+                    'front': fields['question'],
+                    'back': fields['question'],
+                    'tags': ['cloze']
+                }
+            elif 'answer' in card:
+                parsed = {
+                    'front': fields['question'],
+                    'back': self._text(card['answer'], end).strip(),
+                    'tags': []
+                }
             else:
-                # Regular Q&A card
-                question_match = re.search(r'<h4>Question:</h4>\s*<p>(.*?)</p>', card_content, re.DOTALL)
-                answer_match = re.search(r'<h4>Answer:</h4>(.*?)$', card_content, re.DOTALL)
-
-                if question_match and answer_match:
-                    question = question_match.group(1).strip()
-                    answer = answer_match.group(1).strip()
-                    extracted.append({
-                        'front': question,
-                        'back': answer,
-                        'tags': []
-                    })
+                return
+        elif all(name in fields for name in self.FIELD_CLASSES):
+            parsed = {
+                'front': fields['front'],
+                'back': fields['back'],
+                'tags': fields['tags'].split()
+            }
+        else:
+            return
+
+        if card['key']:
+            parsed['key'] = card['key']
+        self.cards.append(parsed)
+
+
+def iter_cards_from_html(filename, chunk_size=1 << 16):
+    """Yield cards (dicts with front/back/tags, plus key if authored) from an HTML file in one pass"""
+    parser = CardParser()
+    with open(filename, 'r', encoding='utf-8') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            parser.feed(chunk)
+            if parser.cards:
+                yield from parser.cards
+                parser.cards.clear()
+    parser.close()
+    yield from parser.cards
+
+
+def extract_cards_from_html(filename):
+    """Extract cards from HTML file and return as list of dicts"""
+    return list(iter_cards_from_html(filename))
+
+
+# Parsed-card cache: one JSON Lines file per HTML file. The first line is a
+# header identifying the source (mtime/size for a cheap check, SHA-256 for
+# when only the mtime moved); every following line is one card.
+CARD_CACHE_DIR = '.anki-card-cache'
+CARD_CACHE_VERSION = 2
+
+
+def _cache_path(html_file, cache_dir):
+    return os.path.join(cache_dir, os.path.basename(html_file) + '.jsonl')
+
+
+def _read_cache_header(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.loads(f.readline())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def iter_cached_cards(html_file, cache_dir=CARD_CACHE_DIR):
+    """
+    Yield the cards of an HTML file, from the cache when it is current.
+
+    A cache entry is reused when the file's mtime and size match, or failing
+    that when its content hash does (its header is then rewritten with the
+    new mtime). Otherwise the file is parsed and the cache rewritten. Either
+    way cards are yielded as they are read, never collected.
+    """
+    stat = os.stat(html_file)
+    path = _cache_path(html_file, cache_dir)
+    header = _read_cache_header(path)
+    fresh = {
+        'version': CARD_CACHE_VERSION,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+    }
+
+    if header and header.get('version') == CARD_CACHE_VERSION:
+        if header.get('mtime_ns') == stat.st_mtime_ns and header.get('size') == stat.st_size:
+            with open(path, 'r', encoding='utf-8') as f:
+                next(f)
+                for line in f:
+                    yield json.loads(line)
+            return
+        fresh['sha256'] = file_sha256(html_file)
+        refresh = header.get('sha256') == fresh['sha256']
     else:
-        # Old format: front/back/tags divs
-        card_pattern = r'(?:<!-- Card \d+ -->\s*)?<div class="card">(.*?)</div>\s*(?=(?:<!-- Card|<div class="card">)|\s*</body>)'
-        cards = re.findall(card_pattern, content, re.DOTALL)
+        refresh = False
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if refresh:
+        # Same content, new mtime: copy the entries under a refreshed header
+        try:
+            with open(path, 'r', encoding='utf-8') as f, \
+                    open(tmp_path, 'w', encoding='utf-8') as out:
+                next(f)
+                out.write(json.dumps(dict(header, **fresh)) + '\n')
+                for line in f:
+                    out.write(line)
+                    yield json.loads(line)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return
+
+    fresh.setdefault('sha256', file_sha256(html_file))
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(fresh) + '\n')
+            for card in iter_cards_from_html(html_file):
+                f.write(json.dumps(card, ensure_ascii=False) + '\n')
+                yield card
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Near-duplicate detection. A card's words (front and back, markup
+# dropped, lowercased) are cut into overlapping SHINGLE_WORDS-word
+# shingles and summarized by a one-permutation MinHash signature: each
+# shingle is hashed once, the low bits pick one of SIGNATURE_BINS bins and
+# each bin keeps its smallest value (empty bins borrow from the next full
+# one). The share of equal bins between two signatures estimates the
+# Jaccard similarity of the cards' shingle sets. Locality-sensitive hashing
+# then buckets cards by bands of LSH_ROWS bins, so only cards sharing a
+# band are compared - near-linear instead of all pairs.
+SHINGLE_WORDS = 3
+SIGNATURE_BINS = 64          # a power of two
+LSH_ROWS = 4                 # 16 bands of 4 bins
+DUPLICATE_THRESHOLD = 0.8
+MAX_BUCKET_PAIRS = 32        # larger buckets only compare against their first card
+
+_WORD = re.compile(r'\w+')
+_MARKUP = re.compile(r'<!--.*?-->|<[^>]*>', re.DOTALL)
+_BIN_BITS = SIGNATURE_BINS.bit_length() - 1
+_VALUE_BITS = 32 - _BIN_BITS
+_EMPTY_BIN = 1 << _VALUE_BITS
+
+
+def card_shingles(card_data):
+    """crc32 hashes of the card's word shingles"""
+    text = card_data['front']
+    if card_data['back'] != text:
+        text += '\n' + card_data['back']
+    # Only the words matter here, so markup is simply blanked out (much
+    # cheaper than html_to_text on large corpora)
+    words = _WORD.findall(html.unescape(_MARKUP.sub(' ', text)).lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {zlib.crc32(' '.join(words[i:i + SHINGLE_WORDS]).encode('utf-8'))
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def card_signature(card_data):
+    """MinHash signature of a card: SIGNATURE_BINS 32-bit values, as bytes"""
+    bins = [_EMPTY_BIN] * SIGNATURE_BINS
+    mask = SIGNATURE_BINS - 1
+    for h in card_shingles(card_data):
+        value = h >> _BIN_BITS
+        if value < bins[h & mask]:
+            bins[h & mask] = value
+    # Densify: an empty bin takes the next full bin's value, offset by the
+    # distance so it can only match a bin filled the same way
+    signature = array('I', bins)
+    for i, value in enumerate(bins):
+        if value == _EMPTY_BIN:
+            for distance in range(1, SIGNATURE_BINS):
+                borrowed = bins[(i + distance) & mask]
+                if borrowed != _EMPTY_BIN:
+                    signature[i] = borrowed + (distance << _VALUE_BITS)
+                    break
+    return signature.tobytes()
+
 
-        for card_html in cards:
-            # Extract front
-            front_match = re.search(r'<div class="front">(.*?)</div>', card_html, re.DOTALL)
-            # Extract back
-            back_match = re.search(r'<div class="back">(.*?)</div>\s*<div class="tags">', card_html, re.DOTALL)
-            # Extract tags
-            tags_match = re.search(r'<div class="tags">(.*?)</div>', card_html, re.DOTALL)
+def deck_signatures(html_file, cache_dir=CARD_CACHE_DIR):
+    """
+    Signatures of every card in a deck, cached next to the parsed cards and
+    keyed on the HTML's SHA-256. Module-level for worker processes.
+    """
+    header = {
+        'sha256': file_sha256(html_file),
+        'shingle_words': SHINGLE_WORDS,
+        'bins': SIGNATURE_BINS,
+    }
+    path = os.path.join(cache_dir, os.path.basename(html_file) + '.minhash')
+    size = SIGNATURE_BINS * 4
+    try:
+        with open(path, 'rb') as f:
+            if json.loads(f.readline()) == header:
+                data = f.read()
+                return [data[i:i + size] for i in range(0, len(data), size)]
+    except (FileNotFoundError, ValueError):
+        pass
 
-            if front_match and back_match and tags_match:
-                front = front_match.group(1).strip()
-                back = back_match.group(1).strip()
-                tags = tags_match.group(1).strip().split()
+    signatures = [card_signature(card_data) for card_data in iter_cached_cards(html_file)]
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps(header).encode('utf-8') + b'\n')
+        f.write(b''.join(signatures))
+    os.replace(tmp_path, path)
+    return signatures
 
-                extracted.append({
-                    'front': front,
-                    'back': back,
-                    'tags': tags
-                })
 
-    return extracted
+def signature_similarity(a, b):
+    """Estimated Jaccard similarity of two cards from their signatures"""
+    # Equal bins XOR to zero words; far cheaper than comparing bin by bin
+    xor = int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')
+    return array('I', xor.to_bytes(len(a), 'little')).count(0) / SIGNATURE_BINS
+
+
+def find_near_duplicates(deck_signatures, threshold=DUPLICATE_THRESHOLD):
+    """
+    Find pairs of near-duplicate cards across (and within) decks.
+
+    deck_signatures holds one list of card signatures per deck. Returns
+    sorted (earlier, later, similarity) tuples, each card given as
+    (deck index, card index).
+    """
+    cards = [(d, c) for d, signatures in enumerate(deck_signatures)
+             for c in range(len(signatures))]
+    signatures = [signature for deck in deck_signatures for signature in deck]
+    band_bytes = LSH_ROWS * 4
+
+    # One band at a time, so only one band's buckets are in memory
+    candidates = set()
+    for start in range(0, SIGNATURE_BINS * 4, band_bytes):
+        buckets = {}
+        for n, signature in enumerate(signatures):
+            buckets.setdefault(signature[start:start + band_bytes], []).append(n)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) <= MAX_BUCKET_PAIRS:
+                candidates.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+            else:
+                candidates.update((members[0], b) for b in members[1:])
+
+    pairs = []
+    for a, b in candidates:
+        similarity = signature_similarity(signatures[a], signatures[b])
+        if similarity >= threshold:
+            pairs.append((cards[a], cards[b], similarity))
+    pairs.sort()
+    return pairs
+
+
+def duplicates_to_drop(pairs):
+    """
+    {deck index: {card index, ...}} of the cards to drop: every card that
+    duplicates an earlier card that is itself kept.
+    """
+    earlier = {}
+    for a, b, _ in pairs:
+        earlier.setdefault(b, []).append(a)
+    dropped = set()
+    for card in sorted(earlier):
+        if any(original not in dropped for original in earlier[card]):
+            dropped.add(card)
+    by_deck = {}
+    for d, c in dropped:
+        by_deck.setdefault(d, set()).add(c)
+    return by_deck
+
+
+def find_duplicate_cards(configs, threshold=DUPLICATE_THRESHOLD, workers=1):
+    """Near-duplicate pairs across the given decks, signing decks in parallel"""
+    html_files = [config.html_file for config in configs]
+    if workers == 1 or len(html_files) < 2:
+        signatures = [deck_signatures(html_file) for html_file in html_files]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(html_files))) as pool:
+            signatures = list(pool.map(deck_signatures, html_files))
+    return find_near_duplicates(signatures, threshold)
+
+
+def report_duplicates(configs, pairs, dropped=None):
+    """Print each near-duplicate pair with the cards' front text"""
+    if not pairs:
+        print('- No near-duplicate cards found')
+        return
+    involved = {d for a, b, _ in pairs for d, _ in (a, b)}
+    fronts = {}
+    for d in involved:
+        for c, card_data in enumerate(iter_cached_cards(configs[d].html_file)):
+            text = ' '.join(html_to_text(card_data['front']).split())
+            fronts[d, c] = text if len(text) <= 60 else text[:57] + '...'
+
+    def label(card):
+        d, c = card
+        return f'{configs[d].key}#{c + 1} "{fronts[card]}"'
+
+    print(f'Near-duplicate cards ({len(pairs)} pairs):')
+    for a, b, similarity in pairs:
+        print(f'  {similarity:.2f}  {label(a)}')
+        print(f'        ~ {label(b)}')
+    if dropped:
+        total = sum(len(cards) for cards in dropped.values())
+        print(f'- Dropping {total} duplicate cards (keeping the first of each)')
 
 
 # Define the card models
@@ -256,8 +708,192 @@ CS_VOCAB_CLOZE_MODEL = genanki.Model(
 )
 
 
-def create_deck_package(html_file, deck_name, output_file, deck_id):
-    """Create an Anki package from HTML file"""
+# Bump whenever make_note changes what goes into a note, so the build
+# manifest treats every package as stale
+NOTE_FORMAT_VERSION = 2
+
+
+def make_note(card_data):
+    """Turn one parsed card into a genanki.Note"""
+    # Sort by the front's plain text (as Anki does), not its HTML
+    sort_field = html_to_text(card_data['front'])
+
+    # Use cloze model if card has cloze tag
+    if 'cloze' in card_data['tags']:
+        return genanki.Note(
+            model=CS_VOCAB_CLOZE_MODEL,
+            fields=[card_data['front']],
+            sort_field=sort_field,
+            tags=card_data['tags']
+        )
+    return genanki.Note(
+        model=CS_VOCAB_MODEL,
+        fields=[card_data['front'], card_data['back']],
+        sort_field=sort_field,
+        tags=card_data['tags']
+    )
+
+
+# Note GUIDs: Anki matches imported notes to existing ones by GUID, and
+# genanki's default GUID is a hash of the fields, so without this map any
+# edit would import as a new note. note-guids.json keeps, per deck ID, one
+# entry per note: its GUID, the card's authored key (if any), digests of the
+# front and back text used to recognise the card after an edit, and a digest
+# of the whole note that --delta compares against.
+NOTE_GUIDS = 'note-guids.json'
+DELTA_PACKAGE = 'cs-vocab-delta.apkg'
+
+
+def _short_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def note_hash(note):
+    """Digest of everything an import would write into the note"""
+    return _short_digest(json.dumps([note.model.model_id, note.fields, note.tags],
+                                    ensure_ascii=False))
+
+
+def assign_guids(deck_id, notes, keys, previous=()):
+    """
+    Give each note a GUID that survives edits; returns the notes' new
+    note-guids.json entries.
+
+    A note takes over a previous entry with the same authored key, else one
+    with the same front text, else one with the same back text (so fixing a
+    typo on either side keeps the note). Cards seen for the first time get
+    a GUID from their authored key, or genanki's usual field hash, which is
+    what every build before this map used.
+    """
+    fronts = [_short_digest(html_to_text(note.fields[0])) for note in notes]
+    backs = [_short_digest(html_to_text(note.fields[-1])) for note in notes]
+    matched = [None] * len(notes)
+    claimed = set()
+
+    def claim(i, candidates):
+        for j in candidates:
+            if j not in claimed:
+                claimed.add(j)
+                matched[i] = previous[j]
+                return
+
+    by_key, by_front, by_back = {}, {}, {}
+    for j, entry in enumerate(previous):
+        if entry.get('key'):
+            by_key.setdefault(entry['key'], []).append(j)
+        by_front.setdefault(entry['front'], []).append(j)
+        by_back.setdefault(entry['back'], []).append(j)
+    for i, key in enumerate(keys):
+        if key:
+            claim(i, by_key.get(key, ()))
+    for i in range(len(notes)):
+        if matched[i] is None:
+            claim(i, by_front.get(fronts[i], ()))
+    for i in range(len(notes)):
+        if matched[i] is None:
+            claim(i, by_back.get(backs[i], ()))
+
+    # GUIDs stay unique within the deck, retired ones included
+    taken = {entry['guid'] for entry in previous}
+    entries = []
+    for i, note in enumerate(notes):
+        if matched[i] is not None:
+            guid = matched[i]['guid']
+        else:
+            guid = genanki.guid_for(deck_id, keys[i]) if keys[i] else note.guid
+            n = 0
+            while guid in taken:
+                n += 1
+                guid = genanki.guid_for(note.guid, deck_id, n)
+        taken.add(guid)
+        note.guid = guid
+        entry = {'guid': guid, 'front': fronts[i], 'back': backs[i], 'hash': note_hash(note)}
+        if keys[i]:
+            entry['key'] = keys[i]
+        entries.append(entry)
+    return entries
+
+
+def load_note_guids(path=NOTE_GUIDS):
+    """Load the {deck ID: [entry, ...]} GUID map (empty if none)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_note_guids(note_guids, path=NOTE_GUIDS):
+    """Write the GUID map atomically, one note per line so diffs stay readable"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for d, deck_id in enumerate(sorted(note_guids, key=int)):
+            f.write(',' if d else '')
+            f.write(f'\n  {json.dumps(deck_id)}: [')
+            for n, entry in enumerate(note_guids[deck_id]):
+                f.write(',' if n else '')
+                f.write('\n    ' + json.dumps(entry, ensure_ascii=False, sort_keys=True))
+            f.write('\n  ]')
+        f.write('\n}\n')
+    os.replace(tmp_path, path)
+
+
+def package_guid_entries(apkg_file):
+    """
+    note-guids.json entries for the notes of an existing .apkg, as
+    {deck ID: [entry, ...]}, so GUIDs of already-imported notes can be
+    adopted (see --adopt-guids). Their note hash is unknown, so --delta
+    treats them as changed once.
+    """
+    with zipfile.ZipFile(apkg_file) as package, tempfile.TemporaryDirectory() as tmp_dir:
+        path = package.extract('collection.anki2', tmp_dir)
+        db = sqlite3.connect(path)
+        try:
+            rows = db.execute('SELECT notes.guid, notes.flds, MIN(cards.did) FROM notes '
+                              'JOIN cards ON cards.nid = notes.id '
+                              'GROUP BY notes.id ORDER BY notes.id').fetchall()
+        finally:
+            db.close()
+    entries = {}
+    for guid, flds, deck_id in rows:
+        fields = flds.split('\x1f')
+        entries.setdefault(str(deck_id), []).append({
+            'guid': guid,
+            'front': _short_digest(html_to_text(fields[0])),
+            'back': _short_digest(html_to_text(fields[-1])),
+            'hash': '',
+        })
+    return entries
+
+
+def adopt_package_guids(note_guids, apkg_files):
+    """
+    Put the notes of existing packages first in each deck's GUID entries,
+    so cards matching them by front or back text take over their GUIDs.
+    Returns the IDs of the decks affected.
+    """
+    adopted = {}
+    for apkg_file in apkg_files:
+        for deck_id, entries in package_guid_entries(apkg_file).items():
+            seen = {entry['guid'] for entry in adopted.get(deck_id, ())}
+            adopted.setdefault(deck_id, []).extend(
+                entry for entry in entries if entry['guid'] not in seen)
+    for deck_id, entries in adopted.items():
+        guids = {entry['guid'] for entry in entries}
+        note_guids[deck_id] = entries + [entry for entry in note_guids.get(deck_id, ())
+                                         if entry['guid'] not in guids]
+    return {int(deck_id) for deck_id in adopted}
+
+
+def build_deck(html_file, deck_name, deck_id, previous_guids=(), skip=()):
+    """
+    Parse an HTML file into an in-memory genanki.Deck (nothing is written).
+
+    previous_guids is the deck's last note-guids.json entry list, and skip
+    the indices of cards to leave out (dropped duplicates); returns (deck,
+    new entries).
+    """
 
     # Create deck with proper naming for subdecks
     deck = genanki.Deck(
@@ -265,32 +901,45 @@ def create_deck_package(html_file, deck_name, output_file, deck_id):
         deck_name
     )
 
-    # Extract cards
-    cards = extract_cards_from_html(html_file)
-
-    # Add cards to deck
-    for card_data in cards:
-        # Use cloze model if card has cloze tag
-        if 'cloze' in card_data['tags']:
-            note = genanki.Note(
-                model=CS_VOCAB_CLOZE_MODEL,
-                fields=[card_data['front']],
-                tags=card_data['tags']
-            )
-        else:
-            note = genanki.Note(
-                model=CS_VOCAB_MODEL,
-                fields=[card_data['front'], card_data['back']],
-                tags=card_data['tags']
-            )
-        deck.add_note(note)
-
-    # Create package
-    package = genanki.Package(deck)
-    package.write_to_file(output_file)
+    # Add cards to deck as the parser (or the card cache) yields them
+    keys = []
+    for i, card_data in enumerate(iter_cached_cards(html_file)):
+        if i in skip:
+            continue
+        deck.add_note(make_note(card_data))
+        keys.append(card_data.get('key'))
+
+    entries = assign_guids(deck_id, deck.notes, keys, previous_guids)
+    return deck, entries
+
+
+def run_deck_job(job):
+    """
+    Build one deck, writing its package when asked to.
+
+    Module-level so it can run in a worker process; returns (deck, GUID
+    entries, message) instead of printing so the parent can report results
+    in config order and save the GUID map once.
+    """
+    html_file, deck_name, output_file, deck_id, write, previous_guids, skip = job
+    try:
+        deck, entries = build_deck(html_file, deck_name, deck_id, previous_guids, skip)
+        if not write:
+            return deck, entries, None
+        genanki.Package(deck).write_to_file(output_file)
+        return deck, entries, f'✓ Created {output_file} - {len(deck.notes)} cards in deck "{deck_name}"'
+    except FileNotFoundError:
+        return None, None, f'✗ Error: {html_file} not found'
+    except Exception as e:
+        return None, None, f'✗ Error creating {output_file}: {e}'
+
 
-    print(f'✓ Created {output_file} - {len(cards)} cards in deck "{deck_name}"')
-    return deck
+def run_deck_jobs(jobs, workers=1):
+    """Run deck jobs serially or across a process pool, preserving order"""
+    if workers == 1 or len(jobs) < 2:
+        return [run_deck_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(run_deck_job, jobs))
 
 
 def create_combined_package(decks, output_file):
@@ -301,150 +950,773 @@ def create_combined_package(decks, output_file):
     print(f'✓ Created {output_file} - {total_cards} total cards across {len(decks)} decks')
 
 
-if __name__ == '__main__':
+def create_delta_package(decks, previous_guids, output_file=DELTA_PACKAGE):
+    """
+    Package only the notes added or changed since the previous build.
+
+    previous_guids maps deck ID to the entries the last build saved; a note
+    is included when its GUID is new or its note hash differs. Importing
+    the delta updates the changed notes in place (their GUIDs are stable).
+    """
+    delta_decks = []
+    added = changed = 0
+    for deck in decks:
+        before = {entry['guid']: entry['hash']
+                  for entry in previous_guids.get(str(deck.deck_id), ())}
+        delta = genanki.Deck(deck.deck_id, deck.name)
+        for note in deck.notes:
+            old_hash = before.get(note.guid)
+            if old_hash is None:
+                added += 1
+            elif old_hash != note_hash(note):
+                changed += 1
+            else:
+                continue
+            delta.add_note(note)
+        if delta.notes:
+            delta_decks.append(delta)
+
+    if not delta_decks:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        print(f'- No notes added or changed; no {output_file} written')
+        return
+    genanki.Package(delta_decks).write_to_file(output_file)
+    print(f'✓ Created {output_file} - {added} added and {changed} changed notes '
+          f'across {len(delta_decks)} decks')
+
+
+# Anki text export: tab-separated, one note per line, with file headers so
+# Anki picks the deck and notetype itself. Fields containing tabs, newlines
+# or quotes are double-quoted (quotes doubled), which Anki's importer reads
+# back verbatim. Cloze cards go to the built-in "Cloze" notetype.
+TXT_HEADER = """#separator:tab
+#html:true
+#notetype column:1
+#tags column:4
+#deck:{deck_name}
+"""
+
+
+def txt_output_file(html_file):
+    """git-flashcards.html -> git-anki-import.txt"""
+    stem = os.path.basename(html_file)
+    if stem.endswith('-flashcards.html'):
+        stem = stem[:-len('-flashcards.html')]
+    else:
+        stem = os.path.splitext(stem)[0]
+    return f'{stem}-anki-import.txt'
+
+
+def export_deck_txt(html_file, deck_name, output_file=None, skip=()):
+    """Stream a deck's cards into an Anki text-import file; returns card count"""
+    output_file = output_file or txt_output_file(html_file)
+    tmp_path = output_file + '.tmp'
+    count = 0
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(TXT_HEADER.format(deck_name=deck_name))
+            writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+            for i, card_data in enumerate(iter_cached_cards(html_file)):
+                if i in skip:
+                    continue
+                tags = ' '.join(card_data['tags'])
+                if 'cloze' in card_data['tags']:
+                    writer.writerow(['Cloze', card_data['front'], '', tags])
+                else:
+                    writer.writerow(['Basic', card_data['front'], card_data['back'], tags])
+                count += 1
+        os.replace(tmp_path, output_file)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    print(f'✓ Created {output_file} - {count} cards for deck "{deck_name}"')
+    return count
+
+
+# Build manifest for incremental rebuilds: maps each output .apkg to the
+# digest of everything that went into it (HTML bytes, deck name/ID, models).
+BUILD_MANIFEST = 'anki-build-manifest.json'
+COMBINED_PACKAGE = 'cs-vocab-all.apkg'
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def models_fingerprint():
+    """Hash the parts of both card models that end up inside every package"""
+    digest = hashlib.sha256(f'note-format-{NOTE_FORMAT_VERSION}'.encode('utf-8'))
+    for model in (CS_VOCAB_MODEL, CS_VOCAB_CLOZE_MODEL):
+        digest.update(json.dumps([
+            model.model_id,
+            model.name,
+            model.fields,
+            model.templates,
+            model.css,
+            model.model_type,
+        ], sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def deck_digest(html_file, deck_name, deck_id, models_hash, skip=()):
+    """Digest identifying one deck build; changes whenever its .apkg would"""
+    parts = [file_sha256(html_file), deck_name, str(deck_id), models_hash]
+    if skip:
+        parts.append(json.dumps(sorted(skip)))
+    key = '\0'.join(parts)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def combined_package_digest(deck_digests):
+    """Digest of the combined package: changes whenever any deck's does"""
+    return hashlib.sha256(''.join(deck_digests).encode('utf-8')).hexdigest()
+
+
+def load_build_manifest(path=BUILD_MANIFEST):
+    """Load the previous build's {output_file: digest} map (empty if none)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_build_manifest(manifest, path=BUILD_MANIFEST):
+    """Write the manifest atomically so an interrupted build can't corrupt it"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+# Card index: every card's plain text in an SQLite FTS5 table, for
+# search-cards.py. It is filled from the same in-memory decks the packages
+# are written from, and updated per deck: the decks table records the
+# digest each deck was indexed at, so unchanged decks are left alone.
+CARD_INDEX = 'card-index.sqlite3'
+CARD_INDEX_VERSION = 1
+
+CARD_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    deck_id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS cards USING fts5(
+    front, back, deck, tags, guid UNINDEXED, deck_id UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+"""
+
+
+def open_card_index(path=CARD_INDEX):
+    """
+    Open (creating or resetting if outdated) the card index. Raises
+    sqlite3.OperationalError when SQLite was built without FTS5.
+    """
+    db = sqlite3.connect(path)
+    try:
+        if db.execute('PRAGMA user_version').fetchone()[0] != CARD_INDEX_VERSION:
+            db.executescript('DROP TABLE IF EXISTS decks; DROP TABLE IF EXISTS cards;')
+            db.execute(f'PRAGMA user_version = {CARD_INDEX_VERSION}')
+        db.executescript(CARD_INDEX_SCHEMA)
+    except sqlite3.Error:
+        db.close()
+        raise
+    return db
+
+
+def indexed_digests(db):
+    """{deck ID: digest} of the decks currently in the index"""
+    return dict(db.execute('SELECT deck_id, digest FROM decks'))
+
+
+def index_deck(db, config, deck, digest):
+    """Replace a deck's rows in the index with the notes of a built deck"""
+    db.execute('DELETE FROM cards WHERE deck_id = ?', (config.deck_id,))
+    db.executemany(
+        'INSERT INTO cards (front, back, deck, tags, guid, deck_id) VALUES (?, ?, ?, ?, ?, ?)',
+        ((html_to_text(note.fields[0]),
+          html_to_text(note.fields[1]) if len(note.fields) > 1 else '',
+          config.deck_name, ' '.join(note.tags), note.guid, config.deck_id)
+         for note in deck.notes))
+    db.execute('INSERT OR REPLACE INTO decks VALUES (?, ?, ?, ?)',
+               (config.deck_id, config.key, config.deck_name, digest))
+
+
+def prune_card_index(db, deck_ids):
+    """Drop decks that are no longer built from the index"""
+    for (deck_id,) in db.execute('SELECT deck_id FROM decks').fetchall():
+        if deck_id not in deck_ids:
+            db.execute('DELETE FROM cards WHERE deck_id = ?', (deck_id,))
+            db.execute('DELETE FROM decks WHERE deck_id = ?', (deck_id,))
+
+
+# Deck registry: {key: {"html", "name", "id", "tags"}}. A deck's package is
+# cs-vocab-<key>.apkg. "id" may be omitted for new decks; one is derived
+# from the deck name. *-flashcards.html files missing from the registry are
+# picked up automatically.
+DECK_REGISTRY = 'deck-registry.json'
+DISCOVER_PATTERN = '*-flashcards.html'
+
+DeckConfig = namedtuple('DeckConfig', 'key html_file deck_name output_file deck_id tags')
+
+
+def stable_deck_id(deck_name):
+    """Deterministic deck ID in genanki's recommended [2**30, 2**31) range"""
+    digest = hashlib.sha256(deck_name.encode('utf-8')).digest()
+    return (1 << 30) + int.from_bytes(digest[:4], 'big') % (1 << 30)
+
+
+def _deck_config(key, entry):
+    deck_name = entry['name']
+    return DeckConfig(
+        key=key,
+        html_file=entry['html'],
+        deck_name=deck_name,
+        output_file=f'cs-vocab-{key}.apkg',
+        deck_id=entry.get('id') or stable_deck_id(deck_name),
+        tags=tuple(entry.get('tags', ())),
+    )
+
+
+@lru_cache(maxsize=None)
+def load_registry(path=DECK_REGISTRY):
+    """Load the registry once, on first use, as an ordered {key: DeckConfig}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    return {key: _deck_config(key, entry) for key, entry in entries.items()}
+
+
+def discover_decks(registry, pattern=DISCOVER_PATTERN):
+    """DeckConfigs for HTML files that aren't in the registry yet"""
+    registered = {config.html_file for config in registry.values()}
+    discovered = []
+    for html_file in sorted(glob.glob(pattern)):
+        if html_file in registered:
+            continue
+        key = os.path.basename(html_file)[:-len('-flashcards.html')]
+        if key in registry:
+            continue
+        title = ' '.join(word.capitalize() for word in key.split('-'))
+        discovered.append(_deck_config(key, {
+            'html': html_file,
+            'name': f'CS Vocab::{title}',
+            'tags': ['discovered'],
+        }))
+    return discovered
+
+
+def all_decks():
+    """Every registered deck, in registry order, followed by discovered ones"""
+    registry = load_registry()
+    decks = list(registry.values()) + discover_decks(registry)
+    seen = {}
+    for config in decks:
+        if config.deck_id in seen:
+            raise ValueError(f'Deck ID {config.deck_id} of "{config.deck_name}" is already '
+                             f'used by "{seen[config.deck_id]}"; set an explicit "id" '
+                             f'in {DECK_REGISTRY}')
+        seen[config.deck_id] = config.deck_name
+    return decks
+
+
+def select_decks(only=None, tags=None):
+    """
+    Decks to build. --only keys are looked up directly in the registry (and
+    only fall back to discovery for unknown keys); --tag filters by tag.
+    """
+    if only:
+        registry = load_registry()
+        selected = []
+        missing = []
+        for key in only:
+            if key in registry:
+                selected.append(registry[key])
+            else:
+                missing.append(key)
+        if missing:
+            discovered = {config.key: config for config in discover_decks(registry)}
+            for key in missing:
+                if key not in discovered:
+                    raise SystemExit(f'✗ Error: unknown deck "{key}" (not in {DECK_REGISTRY} '
+                                     f'and no {key}-flashcards.html)')
+                selected.append(discovered[key])
+    else:
+        selected = all_decks()
+    if tags:
+        selected = [config for config in selected if set(tags) & set(config.tags)]
+    return selected
+
+
+def create_combined_from_cache(output_file=COMBINED_PACKAGE, dropped=None, index=None):
+    """
+    Rebuild only the combined package, reading cards from the card cache.
+
+    Individual .apkg files are left alone; only HTML files that changed
+    since they were last cached get re-parsed. dropped maps deck keys to
+    the indices of duplicate cards to leave out; index, an open card index,
+    is brought up to date too.
+    """
+    models_hash = models_fingerprint()
+    configs = all_decks()
+    dropped = dropped or {}
+    note_guids = load_note_guids()
+    indexed = indexed_digests(index) if index is not None else {}
+    decks = []
+    digests = []
+    reindexed = 0
+    for config in configs:
+        deck_id = str(config.deck_id)
+        skip = dropped.get(config.key, ())
+        try:
+            deck, note_guids[deck_id] = build_deck(config.html_file, config.deck_name,
+                                                   config.deck_id, note_guids.get(deck_id, ()),
+                                                   skip)
+            decks.append(deck)
+            digests.append(deck_digest(config.html_file, config.deck_name, config.deck_id,
+                                       models_hash, skip))
+        except FileNotFoundError:
+            print(f'✗ Error: {config.html_file} not found')
+            continue
+        if index is not None and indexed.get(config.deck_id) != digests[-1]:
+            index_deck(index, config, deck, digests[-1])
+            reindexed += 1
+
+    if not decks:
+        return
+    create_combined_package(decks, output_file)
+    save_note_guids(note_guids)
+    if index is not None:
+        prune_card_index(index, {config.deck_id for config in configs})
+        index.commit()
+        if reindexed:
+            print(f'✓ Updated {CARD_INDEX} - {reindexed} decks reindexed')
+    if len(decks) == len(configs):
+        manifest = load_build_manifest()
+        manifest[output_file] = combined_package_digest(digests)
+        save_build_manifest(manifest)
+
+
+# Watch mode: after the normal build every deck stays parsed in memory and
+# the HTML files are watched (inotify on Linux, polling elsewhere). A burst
+# of saves is debounced into one rebuild of just the changed decks, and the
+# combined package is rewritten from the warm decks without re-reading any
+# other HTML.
+WATCH_DEBOUNCE = 0.2         # seconds without saves that end a burst
+WATCH_POLL_INTERVAL = 0.5
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080          # editors that save via a temp file and rename
+_INOTIFY_EVENT = struct.Struct('iIII')   # wd, mask, cookie, name length
+
+
+class InotifyWatcher:
+    """Paths of files written in the watched directories, via Linux inotify"""
+
+    kind = 'inotify'
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._dirs = {}   # watch descriptor -> directory
+        for directory in {os.path.dirname(path) for path in paths}:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory or '.'),
+                                        IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                self.close()
+                raise OSError(errno, f'inotify_add_watch failed for {directory or "."}')
+            self._dirs[wd] = directory
+
+    def wait(self, timeout=None):
+        """Paths written since the last call, waiting up to timeout seconds"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        paths = set()
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if wd in self._dirs:
+                paths.add(os.path.join(self._dirs[wd], name))
+        return paths
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Paths whose mtime or size changed, by polling os.stat"""
+
+    kind = 'polling'
+
+    def __init__(self, paths, interval=WATCH_POLL_INTERVAL):
+        self._paths = list(paths)
+        self._interval = interval
+        self._seen = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {}
+        for path in self._paths:
+            try:
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                snapshot[path] = None
+        return snapshot
+
+    def wait(self, timeout=None):
+        """Paths changed since the last call, waiting up to timeout seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._snapshot()
+            changed = {path for path in current if current[path] != self._seen[path]}
+            self._seen = current
+            if changed:
+                return changed
+            delay = self._interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return set()
+            time.sleep(delay)
+
+    def close(self):
+        pass
+
+
+def make_watcher(paths):
+    """An inotify watcher where the platform has one, else a polling one"""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError, TypeError):
+            pass   # no libc inotify (or out of watches): fall back to polling
+    return PollingWatcher(paths)
+
+
+def wait_for_changes(watcher, paths):
+    """
+    Block until some of paths change, then until they haven't changed for
+    WATCH_DEBOUNCE. Other files in the watched directories (editor swap and
+    backup files) neither extend nor cut short that quiet period.
+    """
+    changed = set()
+    while not changed:
+        changed = watcher.wait() & paths
+    deadline = time.monotonic() + WATCH_DEBOUNCE
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return changed
+        more = watcher.wait(remaining) & paths
+        if more:
+            changed |= more
+            deadline = time.monotonic() + WATCH_DEBOUNCE
+
+
+def watch_decks(configs, warm, manifest, note_guids, index, partial, models_hash):
+    """
+    Rebuild decks whenever their HTML changes, until interrupted.
+
+    warm maps output files to the decks the initial build already has in
+    memory; the rest are parsed (from the card cache) before watching.
+    """
+    by_path = {os.path.normpath(config.html_file): config for config in configs}
+    for config in configs:
+        if config.output_file not in warm and os.path.exists(config.html_file):
+            deck_id = str(config.deck_id)
+            warm[config.output_file], note_guids[deck_id] = build_deck(
+                config.html_file, config.deck_name, config.deck_id, note_guids.get(deck_id, ()))
+
+    watcher = make_watcher(by_path)
+    print(f'Watching {len(by_path)} HTML files ({watcher.kind}); press Ctrl+C to stop')
+    try:
+        while True:
+            changed = wait_for_changes(watcher, set(by_path))
+            start = time.perf_counter()
+            rebuilt = 0
+            for path in sorted(changed):
+                config = by_path[path]
+                deck_id = str(config.deck_id)
+                try:
+                    digest = deck_digest(config.html_file, config.deck_name, config.deck_id,
+                                         models_hash)
+                    if manifest.get(config.output_file) == digest:
+                        continue   # saved without changes
+                    deck, entries = build_deck(config.html_file, config.deck_name,
+                                               config.deck_id, note_guids.get(deck_id, ()))
+                    genanki.Package(deck).write_to_file(config.output_file)
+                except FileNotFoundError:
+                    print(f'✗ Error: {config.html_file} not found')
+                    continue
+                except Exception as e:   # a half-finished edit mustn't end the watch
+                    print(f'✗ Error creating {config.output_file}: {e}')
+                    continue
+                print(f'✓ Created {config.output_file} - {len(deck.notes)} cards '
+                      f'in deck "{config.deck_name}"')
+                warm[config.output_file] = deck
+                note_guids[deck_id] = entries
+                manifest[config.output_file] = digest
+                if index is not None:
+                    index_deck(index, config, deck, digest)
+                rebuilt += 1
+            if not rebuilt:
+                continue
+
+            if not partial and all(config.output_file in warm for config in configs):
+                create_combined_package([warm[config.output_file] for config in configs],
+                                        COMBINED_PACKAGE)
+                manifest[COMBINED_PACKAGE] = combined_package_digest(
+                    manifest[config.output_file] for config in configs)
+            save_build_manifest(manifest)
+            save_note_guids(note_guids)
+            if index is not None:
+                index.commit()
+            print(f'- Rebuilt in {time.perf_counter() - start:.2f}s')
+    except KeyboardInterrupt:
+        print()
+        print('Stopped watching')
+    finally:
+        watcher.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate Anki packages for CS Vocab flashcards')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild every package, ignoring the build manifest')
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                        help='build decks in N worker processes (0 = one per CPU)')
+    parser.add_argument('--combined-only', action='store_true',
+                        help=f'only rebuild {COMBINED_PACKAGE}, from the parsed-card cache')
+    parser.add_argument('--txt', action='store_true',
+                        help='also write Anki text-import files (<topic>-anki-import.txt)')
+    parser.add_argument('--txt-only', action='store_true',
+                        help='only write the text-import files, no .apkg packages')
+    parser.add_argument('--no-index', action='store_true',
+                        help=f'skip updating the {CARD_INDEX} search index')
+    parser.add_argument('--watch', action='store_true',
+                        help='after building, keep rebuilding decks as their HTML changes')
+    parser.add_argument('--only', nargs='+', metavar='KEY',
+                        help=f'only build these decks (keys from {DECK_REGISTRY}, e.g. git ssh); '
+                             f'skips {COMBINED_PACKAGE}')
+    parser.add_argument('--adopt-guids', nargs='+', metavar='APKG',
+                        help=f'take note GUIDs from previously shipped packages (notes are '
+                             f'matched by front/back text) and rebuild their decks; '
+                             f'updates {NOTE_GUIDS}')
+    parser.add_argument('--delta', action='store_true',
+                        help=f'also write {DELTA_PACKAGE} with only the notes added or '
+                             f'changed since the last build')
+    parser.add_argument('--duplicates', choices=['report', 'drop'],
+                        help='find near-duplicate cards across all decks and report them, '
+                             'or also drop all but the first of each from the packages')
+    parser.add_argument('--duplicate-threshold', type=float, default=DUPLICATE_THRESHOLD,
+                        metavar='SIMILARITY',
+                        help=f'estimated Jaccard similarity at which cards count as '
+                             f'duplicates (default: {DUPLICATE_THRESHOLD})')
+    parser.add_argument('--tag', nargs='+', metavar='TAG',
+                        help=f'only build decks with one of these registry tags; '
+                             f'skips {COMBINED_PACKAGE}')
+    args = parser.parse_args(argv)
+    if args.watch and (args.combined_only or args.txt_only or args.duplicates == 'drop'):
+        parser.error('--watch cannot be combined with --combined-only, --txt-only '
+                     'or --duplicates drop')
+    if args.jobs < 1:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
     print('CS Vocab Anki Package Generator')
     print('=' * 50)
     print()
 
-    # Generate individual packages
-    decks = []
+    # Duplicates are looked for across every deck, whichever are built
+    dropped = {}
+    if args.duplicates:
+        every_deck = [config for config in all_decks() if os.path.exists(config.html_file)]
+        pairs = find_duplicate_cards(every_deck, args.duplicate_threshold, args.jobs)
+        if args.duplicates == 'drop':
+            dropped = {every_deck[d].key: cards
+                       for d, cards in duplicates_to_drop(pairs).items()}
+        report_duplicates(every_deck, pairs, dropped)
+        print()
 
-    deck_configs = [
-        ('git-flashcards.html', 'CS Vocab::Git', 'cs-vocab-git.apkg', 2059400110),
-        ('tmux-flashcards.html', 'CS Vocab::tmux', 'cs-vocab-tmux.apkg', 2059400111),
-        ('ssh-flashcards.html', 'CS Vocab::SSH', 'cs-vocab-ssh.apkg', 2059400112),
-        ('linux-shell-flashcards.html', 'CS Vocab::Linux Shell', 'cs-vocab-linux.apkg', 2059400113),
-        ('linux-utilities-flashcards.html', 'CS Vocab::Linux Utilities', 'cs-vocab-linux-utils.apkg', 2059400114),
-        ('linux-processes-flashcards.html', 'CS Vocab::Linux Processes', 'cs-vocab-processes.apkg', 2059400115),
-        ('readline-shortcuts-flashcards.html', 'CS Vocab::Readline Shortcuts', 'cs-vocab-readline.apkg', 2059400116),
-        ('shell-scripting-flashcards.html', 'CS Vocab::Shell Scripting', 'cs-vocab-scripting.apkg', 2059400117),
-        ('regex-flashcards.html', 'CS Vocab::Regex Patterns', 'cs-vocab-regex.apkg', 2059400118),
-        ('networking-flashcards.html', 'CS Vocab::Networking', 'cs-vocab-networking.apkg', 2059400119),
-        ('filesystem-flashcards.html', 'CS Vocab::File System Hierarchy', 'cs-vocab-filesystem.apkg', 2059400120),
-        ('shell-config-flashcards.html', 'CS Vocab::Shell Configuration', 'cs-vocab-shell-config.apkg', 2059400121),
-        ('find-tree-flashcards.html', 'CS Vocab::Find and Tree Commands', 'cs-vocab-find.apkg', 2059400122),
-        ('package-diff-flashcards.html', 'CS Vocab::Package Management & Diff', 'cs-vocab-package-diff.apkg', 2059400123),
-        ('text-processing-flashcards.html', 'CS Vocab::Text Processing', 'cs-vocab-text.apkg', 2059400124),
-        ('permissions-flashcards.html', 'CS Vocab::Permissions & Ownership', 'cs-vocab-permissions.apkg', 2059400125),
-        ('archives-compression-flashcards.html', 'CS Vocab::Archives & Compression', 'cs-vocab-archives.apkg', 2059400126),
-        ('logs-monitoring-flashcards.html', 'CS Vocab::System Logs & Monitoring', 'cs-vocab-logs.apkg', 2059400127),
-        ('users-groups-flashcards.html', 'CS Vocab::User & Group Management', 'cs-vocab-users.apkg', 2059400128),
-        ('disk-management-flashcards.html', 'CS Vocab::Disk Management', 'cs-vocab-disk.apkg', 2059400129),
-        ('symlinks-attributes-flashcards.html', 'CS Vocab::Symbolic Links & File Attributes', 'cs-vocab-symlinks.apkg', 2059400130),
-        ('xargs-chaining-flashcards.html', 'CS Vocab::xargs & Command Chaining', 'cs-vocab-xargs.apkg', 2059400131),
-        ('grep-deep-dive-flashcards.html', 'CS Vocab::Grep Deep Dive', 'cs-vocab-grep.apkg', 2059400132),
-        ('gcloud-ml-training-flashcards.html', 'CS Vocab::GCloud ML Training', 'cs-vocab-gcloud.apkg', 2059400133),
-        ('vscode-productivity-flashcards.html', 'CS Vocab::VSCode Productivity', 'cs-vocab-vscode.apkg', 2059400134),
-        ('bash-history-flashcards.html', 'CS Vocab::Bash History & Command Recall', 'cs-vocab-history.apkg', 2059400135),
-        ('job-control-flashcards.html', 'CS Vocab::Job Control', 'cs-vocab-job-control.apkg', 2059400136),
-        ('redirection-pipes-flashcards.html', 'CS Vocab::Redirection & Pipes', 'cs-vocab-redirection.apkg', 2059400137),
-        ('environment-variables-flashcards.html', 'CS Vocab::Environment Variables & PATH', 'cs-vocab-env-vars.apkg', 2059400138),
-        ('quoting-escaping-flashcards.html', 'CS Vocab::Quoting & Escaping', 'cs-vocab-quoting.apkg', 2059400139),
-        ('exit-status-flashcards.html', 'CS Vocab::Exit Status & Return Codes', 'cs-vocab-exit-status.apkg', 2059400140),
-        ('brace-expansion-globbing-flashcards.html', 'CS Vocab::Brace Expansion & Globbing', 'cs-vocab-globbing.apkg', 2059400141),
-        ('aliases-functions-scripts-flashcards.html', 'CS Vocab::Aliases, Functions & Scripts', 'cs-vocab-functions.apkg', 2059400142),
-        ('ci-continuous-integration-flashcards.html', 'CS Vocab::CI/Continuous Integration', 'cs-vocab-ci.apkg', 2059400143),
-        ('linux-history-trivia-flashcards.html', 'CS Vocab::Linux History & Trivia', 'cs-vocab-linux-history.apkg', 2059400144),
-        ('sed-deep-dive-flashcards.html', 'CS Vocab::Sed Deep Dive', 'cs-vocab-sed.apkg', 2059400145),
-        ('linux-sociopolitical-flashcards.html', 'CS Vocab::Linux Sociopolitical History', 'cs-vocab-sociopolitical.apkg', 2059400146),
-        ('common-cli-errors-flashcards.html', 'CS Vocab::Common CLI Errors & Antipatterns', 'cs-vocab-common-errors.apkg', 2059400147),
-        ('common-terminal-workflows-flashcards.html', 'CS Vocab::Common Terminal Workflows', 'cs-vocab-workflows.apkg', 2059400148),
-        ('pytorch-basics-flashcards.html', 'CS Vocab::pythonML::PyTorch Basics', 'cs-vocab-pytorch-basics.apkg', 2059400149),
-        ('training-loop-flashcards.html', 'CS Vocab::pythonML::Training Loop', 'cs-vocab-training-loop.apkg', 2059400150),
-        ('reinforcement-learning-flashcards.html', 'CS Vocab::pythonML::Reinforcement Learning', 'cs-vocab-reinforcement-learning.apkg', 2059400151),
-        ('nlp-transformers-flashcards.html', 'CS Vocab::pythonML::NLP & Transformers', 'cs-vocab-nlp-transformers.apkg', 2059400152),
-        ('model-evaluation-metrics-flashcards.html', 'CS Vocab::pythonML::Model Evaluation & Metrics', 'cs-vocab-model-evaluation.apkg', 2059400153),
-        ('advanced-pytorch-flashcards.html', 'CS Vocab::pythonML::Advanced PyTorch', 'cs-vocab-advanced-pytorch.apkg', 2059400154),
-        ('mlops-langfuse-flashcards.html', 'CS Vocab::pythonML::MLOps with LangFuse', 'cs-vocab-mlops-langfuse.apkg', 2059400155),
-        ('attention-mechanisms-flashcards.html', 'CS Vocab::pythonML::Attention Mechanisms', 'cs-vocab-attention.apkg', 2059400156),
-        ('ffn-activations-flashcards.html', 'CS Vocab::pythonML::Feed-Forward Networks & Activations', 'cs-vocab-ffn.apkg', 2059400157),
-        ('layer-norm-flashcards.html', 'CS Vocab::pythonML::Layer Normalization', 'cs-vocab-layer-norm.apkg', 2059400158),
-        ('generation-strategies-flashcards.html', 'CS Vocab::pythonML::Generation Strategies', 'cs-vocab-generation.apkg', 2059400159),
-        ('tokenization-flashcards.html', 'CS Vocab::pythonML::Tokenization', 'cs-vocab-tokenization.apkg', 2059400160),
-        ('training-dynamics-flashcards.html', 'CS Vocab::pythonML::Training Dynamics', 'cs-vocab-training.apkg', 2059400161),
-        ('inference-optimization-flashcards.html', 'CS Vocab::pythonML::Inference Optimization', 'cs-vocab-inference.apkg', 2059400162),
-        ('loss-functions-flashcards.html', 'CS Vocab::pythonML::Loss Functions & Objectives', 'cs-vocab-loss-functions.apkg', 2059400163),
-        ('peft-flashcards.html', 'CS Vocab::pythonML::Parameter-Efficient Fine-Tuning', 'cs-vocab-peft.apkg', 2059400164),
-        ('transformer-variants-flashcards.html', 'CS Vocab::pythonML::Transformer Variants', 'cs-vocab-transformers.apkg', 2059400165),
-    ]
-
-    for html_file, deck_name, output_file, deck_id in deck_configs:
+    index = None
+    if not args.no_index and not args.txt_only:
         try:
-            deck = create_deck_package(html_file, deck_name, output_file, deck_id)
-            decks.append(deck)
+            index = open_card_index()
+        except sqlite3.OperationalError as e:
+            print(f'✗ Skipping {CARD_INDEX}: {e} (SQLite needs FTS5)')
+
+    if args.combined_only:
+        create_combined_from_cache(dropped=dropped, index=index)
+        if index is not None:
+            index.close()
+        return
+
+    previous = {} if args.force else load_build_manifest()
+    manifest = {}
+    models_hash = models_fingerprint()
+    note_guids = load_note_guids()
+    previous_guids = dict(note_guids)
+    adopted = set()
+    if args.adopt_guids:
+        adopted = adopt_package_guids(note_guids, args.adopt_guids)
+        # Packages (and index rows) of those decks must be rewritten with
+        # the adopted GUIDs
+        rewrite = {config.output_file for config in all_decks() if config.deck_id in adopted}
+        previous = {output_file: digest for output_file, digest in previous.items()
+                    if output_file not in rewrite and output_file != COMBINED_PACKAGE}
+        print(f'- Adopting note GUIDs from {len(args.adopt_guids)} packages '
+              f'({len(adopted)} decks)')
+
+    configs = select_decks(args.only, args.tag)
+    partial = bool(args.only or args.tag)
+
+    if args.txt or args.txt_only:
+        for config in configs:
+            try:
+                export_deck_txt(config.html_file, config.deck_name,
+                                skip=dropped.get(config.key, ()))
+            except FileNotFoundError:
+                print(f'✗ Error: {config.html_file} not found')
+        print()
+        if args.txt_only:
+            return
+    if partial:
+        # Keep the other decks' manifest entries; they weren't looked at
+        manifest.update(previous)
+
+    # Work out which decks changed since the last build
+    pending = []
+    for config in configs:
+        html_file, deck_name, output_file, deck_id = (
+            config.html_file, config.deck_name, config.output_file, config.deck_id)
+        skip = dropped.get(config.key, set())
+        try:
+            digest = deck_digest(html_file, deck_name, deck_id, models_hash, skip)
         except FileNotFoundError:
             print(f'✗ Error: {html_file} not found')
-        except Exception as e:
-            print(f'✗ Error creating {output_file}: {e}')
+            continue
+        stale = previous.get(output_file) != digest or not os.path.exists(output_file)
+        pending.append((html_file, deck_name, output_file, deck_id, digest, stale, skip))
+
+    combined_digest = combined_package_digest(digest for *_, digest, _, _ in pending)
+    combined_stale = not partial and (previous.get(COMBINED_PACKAGE) != combined_digest
+                                      or not os.path.exists(COMBINED_PACKAGE))
+    indexed = indexed_digests(index) if index is not None else {}
+    for deck_id in adopted:
+        indexed.pop(deck_id, None)
 
-    # Generate combined package
-    if decks:
+    # Generate individual packages; unchanged decks are only parsed (not
+    # written) when the combined package or the card index still needs
+    # their notes
+    jobs = []
+    for html_file, deck_name, output_file, deck_id, digest, stale, skip in pending:
+        index_stale = index is not None and indexed.get(deck_id) != digest
+        if stale or combined_stale or index_stale:
+            jobs.append((html_file, deck_name, output_file, deck_id, stale,
+                         note_guids.get(str(deck_id), ()), skip))
+        else:
+            manifest[output_file] = digest
+    digests = {output_file: digest for _, _, output_file, _, digest, _, _ in pending}
+
+    configs_by_output = {config.output_file: config for config in configs}
+    decks = []
+    warm = {}
+    built = 0
+    reindexed = 0
+    for job, (deck, entries, message) in zip(jobs, run_deck_jobs(jobs, args.jobs)):
+        if message:
+            print(message)
+        if deck is None:
+            continue
+        output_file, deck_id, write = job[2], job[3], job[4]
+        manifest[output_file] = digests[output_file]
+        note_guids[str(deck_id)] = entries
+        if index is not None and indexed.get(deck_id) != digests[output_file]:
+            index_deck(index, configs_by_output[output_file], deck, digests[output_file])
+            reindexed += 1
+        built += write
+        decks.append(deck)
+        warm[output_file] = deck
+
+    skipped = sum(1 for *_, stale, _ in pending if not stale)
+    if skipped:
+        print(f'- Reused {skipped} unchanged packages')
+
+    # Generate combined package (only when every deck made it into the build)
+    failed = len(pending) - len(decks)
+    if combined_stale and decks and not failed:
+        print()
+        create_combined_package(decks, COMBINED_PACKAGE)
+        manifest[COMBINED_PACKAGE] = combined_digest
+    elif combined_stale and failed:
+        print(f'✗ Skipped {COMBINED_PACKAGE} - {failed} decks failed to build')
+    elif partial:
+        print(f'- Skipped {COMBINED_PACKAGE} (partial build)')
+    elif not combined_stale:
+        manifest[COMBINED_PACKAGE] = combined_digest
+        print(f'- Reused unchanged {COMBINED_PACKAGE}')
+
+    save_build_manifest(manifest)
+    save_note_guids(note_guids)
+
+    if index is not None:
+        if not partial:
+            prune_card_index(index, {config.deck_id for config in configs})
+        index.commit()
+        if reindexed:
+            print(f'✓ Updated {CARD_INDEX} - {reindexed} decks reindexed')
+
+    if args.delta:
+        # Decks that weren't rebuilt are unchanged, so they add nothing
         print()
-        create_combined_package(decks, 'cs-vocab-all.apkg')
+        create_delta_package(decks, previous_guids)
 
     print()
     print('=' * 50)
     print('Done! Import the .apkg files into Anki.')
     print()
     print('Individual packages:')
-    print('  - cs-vocab-git.apkg         (Git only)')
-    print('  - cs-vocab-tmux.apkg        (tmux only)')
-    print('  - cs-vocab-ssh.apkg         (SSH only)')
-    print('  - cs-vocab-linux.apkg       (Linux Shell only)')
-    print('  - cs-vocab-linux-utils.apkg (Linux Utilities only)')
-    print('  - cs-vocab-processes.apkg   (Linux Processes only)')
-    print('  - cs-vocab-readline.apkg    (Readline/Bash Shortcuts only)')
-    print('  - cs-vocab-scripting.apkg   (Shell Scripting only)')
-    print('  - cs-vocab-regex.apkg       (Regex Patterns only)')
-    print('  - cs-vocab-networking.apkg  (Networking only)')
-    print('  - cs-vocab-filesystem.apkg  (File System Hierarchy only)')
-    print('  - cs-vocab-shell-config.apkg (Shell Configuration only)')
-    print('  - cs-vocab-find.apkg        (Find and Tree Commands only)')
-    print('  - cs-vocab-package-diff.apkg (Package Management & Diff only)')
-    print('  - cs-vocab-text.apkg        (Text Processing only)')
-    print('  - cs-vocab-permissions.apkg (Permissions & Ownership only)')
-    print('  - cs-vocab-archives.apkg    (Archives & Compression only)')
-    print('  - cs-vocab-logs.apkg        (System Logs & Monitoring only)')
-    print('  - cs-vocab-users.apkg       (User & Group Management only)')
-    print('  - cs-vocab-disk.apkg        (Disk Management only)')
-    print('  - cs-vocab-symlinks.apkg    (Symbolic Links & File Attributes only)')
-    print('  - cs-vocab-xargs.apkg       (xargs & Command Chaining only)')
-    print('  - cs-vocab-grep.apkg        (Grep Deep Dive only)')
-    print('  - cs-vocab-gcloud.apkg      (GCloud ML Training only)')
-    print('  - cs-vocab-vscode.apkg      (VSCode Productivity only)')
-    print('  - cs-vocab-history.apkg     (Bash History & Command Recall only)')
-    print('  - cs-vocab-job-control.apkg (Job Control only)')
-    print('  - cs-vocab-redirection.apkg (Redirection & Pipes only)')
-    print('  - cs-vocab-env-vars.apkg    (Environment Variables & PATH only)')
-    print('  - cs-vocab-quoting.apkg     (Quoting & Escaping only)')
-    print('  - cs-vocab-exit-status.apkg (Exit Status & Return Codes only)')
-    print('  - cs-vocab-globbing.apkg    (Brace Expansion & Globbing only)')
-    print('  - cs-vocab-functions.apkg   (Aliases, Functions & Scripts only)')
-    print('  - cs-vocab-ci.apkg          (CI/Continuous Integration only)')
-    print('  - cs-vocab-linux-history.apkg (Linux History & Trivia only)')
-    print('  - cs-vocab-sed.apkg         (Sed Deep Dive only)')
-    print('  - cs-vocab-sociopolitical.apkg (Linux Sociopolitical History only)')
-    print('  - cs-vocab-common-errors.apkg (Common CLI Errors & Antipatterns only)')
-    print('  - cs-vocab-workflows.apkg   (Common Terminal Workflows only)')
-    print('  - cs-vocab-pytorch-basics.apkg (PyTorch Basics only)')
-    print('  - cs-vocab-training-loop.apkg (PyTorch Training Loop only)')
-    print('  - cs-vocab-reinforcement-learning.apkg (Reinforcement Learning only)')
-    print('  - cs-vocab-nlp-transformers.apkg (NLP & Transformers only)')
-    print('  - cs-vocab-model-evaluation.apkg (Model Evaluation & Metrics only)')
-    print('  - cs-vocab-advanced-pytorch.apkg (Advanced PyTorch only)')
-    print('  - cs-vocab-mlops-langfuse.apkg (MLOps with LangFuse only)')
-    print('  - cs-vocab-attention.apkg   (Attention Mechanisms only)')
-    print('  - cs-vocab-ffn.apkg         (Feed-Forward Networks & Activations only)')
-    print('  - cs-vocab-layer-norm.apkg  (Layer Normalization only)')
-    print('  - cs-vocab-generation.apkg  (Generation Strategies only)')
-    print('  - cs-vocab-tokenization.apkg (Tokenization only)')
-    print('  - cs-vocab-training.apkg    (Training Dynamics only)')
-    print('  - cs-vocab-inference.apkg   (Inference Optimization only)')
-    print('  - cs-vocab-loss-functions.apkg (Loss Functions & Objectives only)')
-    print('  - cs-vocab-peft.apkg        (Parameter-Efficient Fine-Tuning only)')
-    print('  - cs-vocab-transformers.apkg (Transformer Variants only)')
-    print()
-    print('Combined package:')
-    print('  - cs-vocab-all.apkg         (All topics)')
+    for config in configs:
+        topic = config.deck_name.rsplit('::', 1)[-1]
+        print(f'  - {config.output_file:<26} ({topic} only)')
+    if not partial:
+        print()
+        print('Combined package:')
+        print(f'  - {COMBINED_PACKAGE:<26} (All topics)')
     print()
-    print('Import creates subdeck structure: CS Vocab → [56 subdecks]')
+    print(f'Import creates subdeck structure: CS Vocab → [{len(configs)} subdecks]')
+
+    if args.watch:
+        print()
+        watch_decks(configs, warm, manifest, note_guids, index,
+                    partial, models_hash)
+    if index is not None:
+        index.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Shared engine for scripts that rewrite the *-flashcards.html files.
+
+A transform is a module-level function from a file's text to its new text
+(module-level so worker processes can run it). run_transform() applies it
+to every file in parallel and writes a file only when its text changed,
+atomically (temp file + rename), so an interrupted run leaves each file
+either untouched or fully rewritten. main() wraps this in the command
+line the scripts share: file arguments, -j and --dry-run.
+"""
+
+import argparse
+import difflib
+import glob
+import itertools
+import os
+import shutil
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_PATTERN = '*-flashcards.html'
+
+# added/removed count changed lines; error is a message, or None
+TransformResult = namedtuple('TransformResult', 'path changed added removed error')
+
+
+def write_atomic(path, text):
+    """Replace a file's contents via a temp file and rename, keeping its mode"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def diff_counts(old, new):
+    """(added, removed) line counts between two texts"""
+    added = removed = 0
+    diff = difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm='', n=0)
+    for line in itertools.islice(diff, 2, None):   # skip the ---/+++ header
+        if line.startswith('+'):
+            added += 1
+        elif line.startswith('-'):
+            removed += 1
+    return added, removed
+
+
+def apply_transform(job):
+    """Transform one file; module-level so it can run in a worker process"""
+    transform, path, dry_run = job
+    try:
+        # newline='' keeps line endings exactly as they are
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            old = f.read()
+        new = transform(old)
+        if new == old:
+            return TransformResult(path, False, 0, 0, None)
+        added, removed = diff_counts(old, new)
+        if not dry_run:
+            write_atomic(path, new)
+        return TransformResult(path, True, added, removed, None)
+    except Exception as e:
+        return TransformResult(path, False, 0, 0, str(e))
+
+
+def run_transform(transform, paths, dry_run=False, workers=1):
+    """Apply transform to every path, serially or across a process pool, in order"""
+    jobs = [(transform, path, dry_run) for path in paths]
+    if workers == 1 or len(jobs) < 2:
+        return [apply_transform(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(apply_transform, jobs, chunksize=8))
+
+
+def main(transform, description, argv=None):
+    """Command line shared by the transform scripts; returns the paths written"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('files', nargs='*',
+                        help=f'HTML files to update (default: all {DEFAULT_PATTERN})')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only report which files would change, and by how many lines')
+    parser.add_argument('-j', '--jobs', type=int, default=0, metavar='N',
+                        help='process files in N worker processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+    workers = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+
+    paths = args.files or sorted(glob.glob(DEFAULT_PATTERN))
+    if not paths:
+        print('No flashcard HTML files found!')
+        return []
+
+    print(f'Found {len(paths)} flashcard files')
+    print()
+
+    results = run_transform(transform, paths, args.dry_run, workers)
+    verb = 'Would update' if args.dry_run else 'Updated'
+    for result in results:
+        if result.error:
+            print(f'✗ Error updating {result.path}: {result.error}')
+        elif result.changed:
+            print(f'✓ {verb}: {result.path} (+{result.added} -{result.removed} lines)')
+
+    changed = [result for result in results if result.changed]
+    unchanged = sum(1 for result in results if not result.changed and not result.error)
+    if unchanged:
+        print(f'- {unchanged} files already up to date')
+    print()
+    print('=' * 50)
+    if args.dry_run:
+        print(f'Dry run: {len(changed)} files would change '
+              f'(+{sum(r.added for r in changed)} -{sum(r.removed for r in changed)} lines). '
+              f'Nothing was written.')
+    else:
+        print(f'Done! Updated {len(changed)} files.')
+        return [result.path for result in changed]
+    return []
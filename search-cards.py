@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Search every CS Vocab card, across all decks, in the card index.
+
+Usage:
+    python3 search-cards.py rebase onto            # best 10 matches
+    python3 search-cards.py '"exit status"' -n 25  # FTS5 query syntax works too
+    python3 search-cards.py attention --deck attention ffn
+    python3 search-cards.py softmax --tag pytorch
+    python3 search-cards.py grep --json            # machine-readable results
+
+The index (card-index.sqlite3) is written by generate-anki-packages.py.
+Words match their stems ("commits" finds "commit"). Results are ranked
+by BM25, with matches in the question counting most, then deck names and
+tags, then answers.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+CARD_INDEX = 'card-index.sqlite3'
+
+# BM25 column weights: front, back, deck, tags (guid and deck_id aren't indexed)
+RANK = 'bm25(cards, 4.0, 1.0, 2.0, 2.0, 0.0, 0.0)'
+
+
+def quote_terms(query):
+    """Turn free text into an FTS5 query of quoted terms, all required"""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def search(db, query, decks=None, tags=None, limit=10):
+    """
+    Ranked matches for query as dicts (front, snippet, deck, key, tags,
+    guid). Anything that isn't valid FTS5 syntax (e.g. "git-rebase") is
+    searched as plain words instead.
+    """
+    sql = [f'''SELECT cards.front, snippet(cards, 1, '[', ']', '...', 16),
+                      cards.deck, decks.key, cards.tags, cards.guid
+               FROM cards JOIN decks ON decks.deck_id = cards.deck_id
+               WHERE cards MATCH ?''']
+    params = []
+    if decks:
+        sql.append(f'AND decks.key IN ({", ".join("?" * len(decks))})')
+        params.extend(decks)
+    for tag in tags or ():
+        sql.append("AND (' ' || cards.tags || ' ') LIKE ?")
+        params.append(f'% {tag} %')
+    sql.append(f'ORDER BY {RANK} LIMIT ?')
+    params.append(limit)
+    sql = '\n'.join(sql)
+
+    try:
+        rows = db.execute(sql, [query] + params).fetchall()
+    except sqlite3.OperationalError:
+        rows = db.execute(sql, [quote_terms(query)] + params).fetchall()
+    return [dict(zip(('front', 'snippet', 'deck', 'key', 'tags', 'guid'), row)) for row in rows]
+
+
+def one_line(text, width):
+    text = ' '.join(text.split())
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search the CS Vocab card index')
+    parser.add_argument('query', nargs='+', help='words to look for (or an FTS5 query)')
+    parser.add_argument('-n', '--limit', type=int, default=10, help='results to show (default: 10)')
+    parser.add_argument('--deck', nargs='+', metavar='KEY',
+                        help='only search these decks (keys from deck-registry.json)')
+    parser.add_argument('--tag', nargs='+', metavar='TAG', help='only cards with all of these tags')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--index', default=CARD_INDEX, help=f'index file (default: {CARD_INDEX})')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.index):
+        sys.exit(f'✗ Error: {args.index} not found; run generate-anki-packages.py first')
+
+    db = sqlite3.connect(f'file:{args.index}?mode=ro', uri=True)
+    start = time.perf_counter()
+    results = search(db, ' '.join(args.query), args.deck, args.tag, args.limit)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    for n, result in enumerate(results, 1):
+        print(f'{n:>2}. [{result["key"]}] {one_line(result["front"], 90)}')
+        if result['snippet']:
+            print(f'    {one_line(result["snippet"], 100)}')
+    print(f'{len(results)} results in {elapsed * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()